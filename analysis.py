@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+===========
+analysis.py
+===========
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Answers the questions that come up before the last rounds of a tournament:
+who can still win the tournament (or finish among the first k players), how
+many points does a player need at least to keep that chance, and how many
+points are enough to be sure of first place.
+
+Trying all outcomes of the remaining games is impossible (three results per
+game), so the question is turned into a flow problem, as in the well-known
+analysis of baseball elimination: every remaining game hands out two half
+points, either both to one player or one to each. Player x with a final score
+of T finishes first (shared places count as first place) exactly if the half
+points of all remaining games can be distributed so that nobody gets more
+than T. This is a maximum flow from the games to the players, where every
+player can take in at most the difference between T and the current score.
+For the first k places, k-1 players may score more than T. If the games
+cannot be distributed, the minimum cut of the flow names the players who
+cannot take in all points of the games between them; one of them has to be
+among the k-1, so the search only tries these players (see can_finish_top).
+Choosing these players is a combinatorial problem, so the search is given up
+after MAX_SEARCH_FLOWS maximum flows, and the result is then marked as not
+proven. For k = 1 there is nothing to choose and the answer is always exact.
+
+All scores in this module are counted in half points to stay with integers.
+
+Functions in analysis.py:
+=========================
+max_flow(nodes, edges, source, sink)
+    Calculates the maximum flow through a network (Dinic's algorithm) and the
+    source side of a minimum cut.
+
+get_remaining_games(tournament)
+    Returns the current scores and the open games of all real players.
+
+can_finish_top(scores, games, player, target, k)
+    Checks if a player with the final score "target" can still finish among
+    the first k, or returns None if the search has been given up.
+
+count_games(scores, games)
+    Returns the number of open games of every player.
+
+get_blocking_players(scores, games, player, target, unlimited)
+    Returns the half points that cannot be distributed so that no player
+    except the "unlimited" ones ends above target, and the players that
+    block them.
+
+distributes_all_games(scores, games, player, target, unlimited)
+    Checks with a maximum flow if the open games can be distributed so that
+    no player except the "unlimited" ones ends above target.
+
+points_needed(scores, games, player, k)
+    Returns the minimal number of half points a player needs from the open
+    games to keep the chance of finishing among the first k, or None, and
+    whether this number is proven.
+
+points_to_clinch(scores, games, player)
+    Returns the number of half points that guarantee at least a shared first
+    place, or None.
+
+print_analysis(tournament, k)
+    Prints current and maximum score, needed and sufficient points for every
+    player.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+from collections import deque
+
+from tournament import RESULT2POINTS, generate_rounds, get_first_cycle
+
+
+# Maximum number of maximum flows for one search of the players that may end
+# above the target (about a millisecond each for 24 players)
+MAX_SEARCH_FLOWS = 40
+
+def max_flow(nodes, edges, source, sink):
+    """Returns a tuple with the value of a maximum flow from source to sink in
+    a network with the nodes 0...nodes-1 and a list of edges (start, end,
+    capacity), and the set of nodes on the source side of a minimum cut.
+    Uses Dinic's algorithm: breadth-first search for the levels of all nodes,
+    then depth-first search for blocking flows along increasing levels. The
+    last search, which does not reach the sink any more, finds the nodes that
+    can still be reached from the source, i.e. the source side of the cut.
+    """
+    # Every edge is stored with its reverse edge at the neighbouring index
+    heads, caps, graph = list(), list(), [list() for _ in range(nodes)]
+    for start, end, capacity in edges:
+        graph[start].append(len(heads))
+        heads.append(end)
+        caps.append(capacity)
+        graph[end].append(len(heads))
+        heads.append(start)
+        caps.append(0)
+
+    flow = 0
+    while True:
+        level = [-1] * nodes
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for edge in graph[node]:
+                if caps[edge] and level[heads[edge]] < 0:
+                    level[heads[edge]] = level[node] + 1
+                    queue.append(heads[edge])
+        if level[sink] < 0:
+            return flow, {node for node in range(nodes) if level[node] >= 0}
+
+        position = [0] * nodes
+
+        def push(node, amount):
+            if node == sink:
+                return amount
+            while position[node] < len(graph[node]):
+                edge = graph[node][position[node]]
+                head = heads[edge]
+                if caps[edge] and level[head] == level[node] + 1:
+                    pushed = push(head, min(amount, caps[edge]))
+                    if pushed:
+                        caps[edge] -= pushed
+                        caps[edge ^ 1] += pushed
+                        return pushed
+                position[node] += 1
+            return 0
+
+        while True:
+            pushed = push(source, float("inf"))
+            if not pushed:
+                break
+            flow += pushed
+
+
+def get_remaining_games(tournament):
+    """Returns a tuple (scores, games, players): the current scores of all
+    players in half points (0-based player indices), the list of all open
+    games as (player, player) pairs, including the rounds of later cycles
+    that have not been added to the tournament data yet, and the indices of
+    the real players. Open games against the bye are counted as won, because
+    their result is certain.
+    """
+    player_list = tournament["player_list"]
+    byes = {i for i, player in enumerate(player_list)
+            if player["name"] == "spielfrei"}
+    scores = [0] * len(player_list)
+    games = list()
+
+    later_rounds = generate_rounds(len(player_list),
+                                   tournament.get("cycles", 1),
+                                   len(tournament["rounds"]) + 1,
+                                   table = get_first_cycle(tournament))
+
+    for pairings in (*tournament["rounds"], *later_rounds):
+        for white, black, result in pairings:
+            white, black = white - 1, black - 1
+            if result != "_":
+                scores[white] += 2 * RESULT2POINTS[result][0]
+                scores[black] += 2 * RESULT2POINTS[result][1]
+            elif white in byes:
+                scores[black] += 2
+            elif black in byes:
+                scores[white] += 2
+            else:
+                games.append((white, black))
+
+    scores = [int(score) for score in scores]
+    players = [i for i in range(len(player_list)) if i not in byes]
+
+    return scores, games, players
+
+
+def can_finish_top(scores, games, player, target, k = 1):
+    """Checks if "player" can finish among the first k players (shared places
+    count) with the final score "target", i.e. if the player scores target
+    minus the current score from the open games and the half points of all
+    other open games can be distributed so that at most k-1 players end above
+    target. Returns True or False, or None if the search has been given up
+    after MAX_SEARCH_FLOWS maximum flows.
+
+    Players that are already above target must be among these k-1 players.
+    If the games cannot be distributed, one of the blocking players (see
+    get_blocking_players) must be added to them, because otherwise the same
+    cut stays too small. The search tries only these players, one at a time.
+    After the first choice has failed, it is left out of the choices that
+    follow, so that no set of players is tried twice. Only players who could
+    still get above target are worth choosing, and a choice is given up if
+    the blocking players with the most points to spare cannot take in the
+    missing points.
+    """
+    counts = count_games(scores, games)
+    if not 0 <= target - scores[player] <= 2 * counts[player]:
+        return False
+
+    above = [i for i in range(len(scores))
+             if i != player and scores[i] > target]
+    if len(above) > k - 1:
+        return False
+
+    candidates = {i for i in range(len(scores)) if i != player
+                  and scores[i] <= target < scores[i] + 2 * counts[i]}
+    flows = 0
+
+    def search(unlimited, free, excluded):
+        nonlocal flows
+        if flows == MAX_SEARCH_FLOWS:
+            return None
+        flows += 1
+        missing, blocking = get_blocking_players(scores, games, player,
+                                                 target, unlimited)
+        if not missing:
+            return True
+        choices = sorted((i for i in blocking if i in candidates
+                          and i not in excluded and blocking[i] > 0),
+                         key = lambda i: blocking[i], reverse = True)
+        if sum(blocking[i] for i in choices[:free]) < missing:
+            return False
+        result = False
+        for number, i in enumerate(choices):
+            found = search(unlimited | {i}, free - 1,
+                           excluded | set(choices[:number]))
+            if found:
+                return True
+            if found is None:
+                result = None
+        return result
+
+    return search(frozenset(above), k - 1 - len(above), frozenset())
+
+
+def count_games(scores, games):
+    """Returns a list with the number of open games of every player.
+    """
+    counts = [0] * len(scores)
+    for white, black in games:
+        counts[white] += 1
+        counts[black] += 1
+
+    return counts
+
+
+def get_blocking_players(scores, games, player, target, unlimited):
+    """Builds the flow network: source -> every open game (2 half points) ->
+    both players of the game -> sink, where every player can take at most the
+    difference between target and the current score, except the players in
+    "unlimited". Returns a tuple (missing, blocking): the number of half
+    points that cannot be distributed, and a dictionary with the players on
+    the source side of a minimum cut, which cannot take in all points of the
+    games among them as long as none of them is unlimited. The value of a
+    player is the number of half points that the games in the cut can give
+    the player above the limit, so making the players S unlimited distributes
+    at most the sum of their values more. Returns (0, empty dictionary) if all
+    half points of all games can be distributed.
+    """
+    # A player who can take in all points of the own games takes them, the
+    # other games are distributed by the flow
+    counts = count_games(scores, games)
+    games = [(white, black) for white, black in games
+             if not any(i in unlimited or target - scores[i] >= 2 * counts[i]
+                        for i in (white, black))]
+    number_players = len(scores)
+    source = number_players + len(games)
+    sink = source + 1
+
+    edges = list()
+    for i, (white, black) in enumerate(games):
+        node = number_players + i
+        edges.append((source, node, 2))
+        edges.append((node, white, 2))
+        edges.append((node, black, 2))
+    for i in range(number_players):
+        if i in unlimited:
+            edges.append((i, sink, 2 * len(games)))
+        else:
+            edges.append((i, sink, max(0, target - scores[i])))
+
+    flow, cut = max_flow(sink + 1, edges, source, sink)
+    if flow == 2 * len(games):
+        return 0, dict()
+
+    # Half points the games of the cut can give to a player above the limit
+    blocking = {i: -max(0, target - scores[i]) for i in cut
+                if i < number_players}
+    for i, (white, black) in enumerate(games):
+        if number_players + i in cut:
+            for j in (white, black):
+                if j in blocking:
+                    blocking[j] += 2
+
+    return 2 * len(games) - flow, blocking
+
+
+def distributes_all_games(scores, games, player, target, unlimited):
+    """Returns True if all half points of all open games can be distributed
+    so that no player except the "unlimited" ones ends above target (see
+    get_blocking_players).
+    """
+    missing, _ = get_blocking_players(scores, games, player, target,
+                                      unlimited)
+
+    return missing == 0
+
+
+def points_needed(scores, games, player, k = 1):
+    """Returns a tuple (points, proven): the minimal number of half points
+    that "player" needs from the own open games to keep the chance of
+    finishing among the first k, or None if these places cannot be reached
+    any more. More points never hurt the player (a half point more for the
+    player is a half point less for an opponent), so the answer is found by
+    bisection over the possible scores.
+
+    A score for which can_finish_top has given up counts as not enough, so
+    the points are always enough, but if the search has been given up on the
+    way, proven is False and fewer points might be enough as well.
+    """
+    own_games = count_games(scores, games)[player]
+    result = can_finish_top(scores, games, player,
+                            scores[player] + 2 * own_games, k)
+    if not result:
+        return None, result is False
+
+    proven = True
+    low, high = 0, 2 * own_games
+    while low < high:
+        middle = (low + high) // 2
+        result = can_finish_top(scores, games, player,
+                                scores[player] + middle, k)
+        if result:
+            high = middle
+        else:
+            low = middle + 1
+            if result is None:
+                proven = False
+
+    return low, proven
+
+
+def points_to_clinch(scores, games, player):
+    """Returns the minimal number of half points from the own open games that
+    guarantee "player" at least a shared first place, whatever the other
+    results are, or None if no own score is enough.
+
+    For first place, one opponent above the player is enough to spoil it, so
+    it is sufficient to check every opponent separately: the opponent wins
+    all other games and as many of the games against the player as the
+    player has not won.
+    """
+    own_games = [game for game in games if player in game]
+
+    for points in range(2 * len(own_games) + 1):
+        target = scores[player] + points
+        # Half points that the player leaves to the opponents
+        left = 2 * len(own_games) - points
+        safe = True
+        for i in range(len(scores)):
+            if i == player:
+                continue
+            direct = sum(1 for game in own_games if i in game)
+            other = sum(1 for game in games if i in game) - direct
+            if scores[i] + 2 * other + min(2 * direct, left) > target:
+                safe = False
+                break
+        if safe:
+            return points
+
+    return None
+
+
+def print_analysis(tournament, k = 1):
+    """Prints for every player the current score, the maximum score, the
+    points needed from the open games to keep the chance of a place among the
+    first k and, for first place, the points that guarantee it. Always
+    returns None.
+    """
+    scores, games, players = get_remaining_games(tournament)
+
+    tmp_str = f"Wer kann noch unter die ersten {k} kommen?" if k > 1 \
+        else "Wer kann das Turnier noch gewinnen?"
+    print("\n" + tmp_str)
+    print("=" * len(tmp_str))
+    print(f"{'':29s}Stand Maximum Benötigt" + ("  Sicher" if k == 1 else ""))
+
+    for player in sorted(players, key = lambda i: scores[i], reverse = True):
+        name = tournament["player_list"][player]["name"]
+        maximum = scores[player] + 2 * sum(1 for game in games
+                                           if player in game)
+        needed, proven = points_needed(scores, games, player, k)
+        line = f"{name[:25]:25s} {scores[player]/2:7.1f} {maximum/2:7.1f} "
+        if needed is None:
+            line += " chancenlos" if proven else "        ?"
+        else:
+            line += f"{needed/2:8.1f}" if proven else f"{needed/2:7.1f}?"
+        if k == 1 and needed is not None:
+            clinch = points_to_clinch(scores, games, player)
+            line += f" {clinch/2:7.1f}" if clinch is not None else "       -"
+        print(line)
+
+    print("\n(Punkte aus den noch offenen Partien, geteilte Plätze zählen)")
+    if k > 1:
+        print("(?: Suche abgebrochen, der Wert ist nicht bewiesen)")
+
+    return None
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+==========
+archive.py
+==========
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Collects the games of all stored tournaments in one archive, so that
+questions across tournaments (all games of a player, head-to-head records,
+performance ratings, club results over a season) can be answered without
+loading every tournament file again.
+
+Data structure:
+===============
+    Dictionary 'archive' with the entries 'files' (dictionary of tournament
+    file names to the modification time when the file was read), 'players'
+    (dictionary of player names to the latest known player details) and
+    'games' (dictionary of columns, one list per column in GAME_COLUMNS, the
+    i-th entry of every list belonging to the i-th game). Only finished games
+    are stored, games against the bye ("spielfrei") and cancelled games are
+    left out. Dates are taken from the entry 'last_round' of the tournament.
+    Team matches are archived as single games on every board.
+
+    The archive is stored in ./data/cache/archive.json. The dictionary
+    'index' (player name to list of game numbers, club to set of player
+    names) is not stored but created anew whenever the archive is loaded or
+    updated.
+
+Functions in archive.py:
+========================
+load_archive()
+    Reads the archive from the cache folder and updates it with all new or
+    changed tournament files.
+
+update_archive(archive)
+    Reads only the tournament files that are new or have changed since the
+    last update, replaces their games in the archive and saves the archive.
+
+get_tournament_games(tournament)
+    Yields round, players and result of every game of a tournament, including
+    the single boards of team matches.
+
+add_tournament_games(archive, filename, tournament)
+    Appends the finished games of a tournament to the archive.
+
+create_archive_index(archive)
+    Creates the index of game numbers per player and player names per club.
+
+player_history(archive, name, since)
+    Returns all archived games of a player, optionally from a date on.
+
+head_to_head(archive, name, opponent)
+    Returns the score of a player against an opponent and the games played.
+
+performance_rating(archive, name, since)
+    Calculates the performance rating of a player from the DWZ of the
+    opponents.
+
+club_scores(archive, since, until)
+    Returns games and points of all clubs within a period of time.
+
+print_player_statistics(archive, name, opponent)
+    Prints the games, score and performance of a player, optionally the
+    head-to-head record against an opponent.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+import json
+import os
+
+from datastorage import CACHE_PATH, read_tournament_data, \
+                        list_tournament_files
+from playerindex import get_players
+from teamtournament import get_board_players
+from tournament import RESULT2POINTS
+
+
+ARCHIVE_FILE = CACHE_PATH + "archive.json"
+
+GAME_COLUMNS = ("tournament", "date", "round", "white", "black", "white_club",
+                "black_club", "white_rating", "black_rating", "result")
+
+# Results that are not stored in the archive: open and cancelled games
+SKIPPED_RESULTS = "_C"
+# Results that count for the score, but not for the performance rating
+FORFEITS = "+-"
+
+
+def load_archive():
+    """Reads the archive from the cache folder, or starts an empty archive if
+    there is none yet, and brings it up to date with the tournament files in
+    the data folder. Returns the archive including its index.
+    """
+    try:
+        with open(ARCHIVE_FILE, "r") as fin:
+            archive = json.loads(fin.read())
+    except Exception:
+        archive = {"files": dict(), "players": dict(),
+                   "games": {column: list() for column in GAME_COLUMNS}}
+
+    return update_archive(archive)
+
+
+def update_archive(archive):
+    """Compares the modification times of the stored tournaments with the
+    times stored in the archive. The games of changed and deleted tournaments
+    are removed in a single pass over the columns, then only the new and
+    changed tournaments are read and their games appended. If anything has
+    changed, the archive is saved. Returns the archive with a new index.
+    """
+    files = list_tournament_files()
+
+    outdated = {f for f, mtime in archive["files"].items()
+                if files.get(f) != mtime}
+    new = [f for f, mtime in files.items()
+           if archive["files"].get(f) != mtime]
+
+    games = archive["games"]
+    if outdated:
+        keep = [i for i, f in enumerate(games["tournament"])
+                if f not in outdated]
+        for column in GAME_COLUMNS:
+            games[column] = [games[column][i] for i in keep]
+        for f in outdated:
+            del archive["files"][f]
+
+    for filename in sorted(new, key = lambda f: files[f]):
+        tournament = read_tournament_data(filename)
+        if not isinstance(tournament, dict):
+            continue
+        add_tournament_games(archive, filename, tournament)
+        archive["files"][filename] = files[filename]
+
+    if outdated or new:
+        try:
+            os.makedirs(CACHE_PATH, exist_ok=True)
+            with open(ARCHIVE_FILE, "w") as fout:
+                fout.write(json.dumps({key: archive[key] for key in
+                                       ("files", "players", "games")}))
+        except Exception as e:
+            print(f"\n\nERROR: Archiv kann nicht gespeichert werden.\n{e}\n\n")
+
+    archive["index"] = create_archive_index(archive)
+
+    return archive
+
+
+def get_tournament_games(tournament):
+    """Generator that yields (round, white, black, result) for every game of a
+    tournament, with the player dictionaries of white and black. Matches of
+    team tournaments are split into the games on the single boards.
+    """
+    players = tournament["player_list"]
+
+    for R, pairings in enumerate(tournament["rounds"], 1):
+        for pairing in pairings:
+            if tournament.get("type") != "team":
+                yield R, players[pairing[0]-1], players[pairing[1]-1], \
+                    pairing[2]
+                continue
+            for board, result in enumerate(pairing[2]):
+                white, black = get_board_players(tournament, pairing, board)
+                yield R, white, black, result
+
+
+def add_tournament_games(archive, filename, tournament):
+    """Appends all finished games of a tournament to the columns of the
+    archive and updates the player details. Always returns None.
+    """
+    games = archive["games"]
+    date = tournament.get("last_round", "")
+
+    for R, white, black, result in get_tournament_games(tournament):
+        if result in SKIPPED_RESULTS \
+                or {"spielfrei", "N.N."} & {white["name"], black["name"]}:
+            continue
+
+        for column, value in zip(GAME_COLUMNS, (
+                filename, date, R, white["name"], black["name"],
+                white.get("club", ""), black.get("club", ""),
+                white.get("DWZ", 0), black.get("DWZ", 0), result)):
+            games[column].append(value)
+
+    for player in get_players(tournament):
+        archive["players"][player["name"]] = player
+
+    return None
+
+
+def create_archive_index(archive):
+    """Creates the index of the archive in one pass over the columns: the game
+    numbers of every player and the players of every club. Returns the index
+    as a dictionary.
+    """
+    games = archive["games"]
+    by_player = dict()
+    by_club = dict()
+
+    for i, (white, black, white_club, black_club) in enumerate(zip(
+            games["white"], games["black"], games["white_club"],
+            games["black_club"])):
+        by_player.setdefault(white, list()).append(i)
+        by_player.setdefault(black, list()).append(i)
+        if white_club:
+            by_club.setdefault(white_club, set()).add(white)
+        if black_club:
+            by_club.setdefault(black_club, set()).add(black)
+
+    return {"player": by_player, "club": by_club}
+
+
+def player_history(archive, name, since = ""):
+    """Returns all archived games of the player "name" from the date "since"
+    (same format as the tournament dates, "yy-mm-dd") on, sorted by date and
+    round. Every game is a dictionary with date, tournament, round, colour,
+    opponent, opponent's rating, result and the points scored by the player.
+    """
+    games = archive["games"]
+    history = list()
+
+    for i in archive["index"]["player"].get(name, []):
+        if games["date"][i] < since:
+            continue
+        is_white = games["white"][i] == name
+        result = games["result"][i]
+        history.append({
+            "date": games["date"][i],
+            "tournament": games["tournament"][i],
+            "round": games["round"][i],
+            "colour": "w" if is_white else "s",
+            "opponent": games["black" if is_white else "white"][i],
+            "rating": games["black_rating" if is_white
+                            else "white_rating"][i],
+            "result": result,
+            "points": RESULT2POINTS[result][0 if is_white else 1]
+            })
+
+    history.sort(key = lambda game: (game["date"], game["tournament"],
+                                     game["round"]))
+
+    return history
+
+
+def head_to_head(archive, name, opponent):
+    """Returns the points scored by the player "name" and by "opponent" in
+    their mutual games and the list of these games (see player_history).
+    """
+    games = [game for game in player_history(archive, name)
+             if game["opponent"] == opponent]
+    points = sum(game["points"] for game in games)
+    opponent_points = sum(RESULT2POINTS[game["result"]][
+        1 if game["colour"] == "w" else 0] for game in games)
+
+    return points, opponent_points, games
+
+
+def performance_rating(archive, name, since = ""):
+    """Calculates the performance rating of a player from all games against
+    opponents with a DWZ from the date "since" on, using the linear
+    approximation: average rating of the opponents plus 400 times the
+    difference of wins and losses divided by the number of games. Forfeits
+    are not rated. Returns 0 if there are no rated games.
+    """
+    games = [game for game in player_history(archive, name, since)
+             if game["rating"] and game["result"] not in FORFEITS]
+    if not games:
+        return 0
+
+    average = sum(game["rating"] for game in games) / len(games)
+    balance = sum(2 * game["points"] - 1 for game in games)
+
+    return round(average + 400 * balance / len(games))
+
+
+def club_scores(archive, since = "", until = "~"):
+    """Returns a dictionary with the clubs as keys and a list of the number of
+    games and the points scored by all players of that club within the given
+    period of time (dates "yy-mm-dd", both included). Games between players of
+    the same club count for that club twice.
+    """
+    games = archive["games"]
+    scores = dict()
+
+    for date, white_club, black_club, result in zip(
+            games["date"], games["white_club"], games["black_club"],
+            games["result"]):
+        if not since <= date <= until:
+            continue
+        points = RESULT2POINTS[result]
+        for club, score in ((white_club, points[0]), (black_club, points[1])):
+            if club:
+                entry = scores.setdefault(club, [0, 0])
+                entry[0] += 1
+                entry[1] += score
+
+    return scores
+
+
+def print_player_statistics(archive, name, opponent = ""):
+    """Prints all archived games of the player "name" with the total score
+    and the performance rating. If an opponent is given, the head-to-head
+    record against that opponent is printed as well. Always returns None.
+    """
+    history = player_history(archive, name)
+
+    tmp_str = f"Partien von {name} im Archiv"
+    print("\n" + tmp_str)
+    print("=" * len(tmp_str))
+
+    for game in history:
+        print(f"{game['date']:8s} R{game['round']:<3d} {game['colour']} ",
+              f"{game['opponent'][:25]:25s}",
+              f"{(str(game['rating']) if game['rating'] else ''):>4s}  ",
+              f"{game['points']}")
+
+    points = sum(game["points"] for game in history)
+    print(f"\n{points} Punkte aus {len(history)} Partien, Leistung",
+          f"{performance_rating(archive, name) or '-'}")
+
+    if opponent:
+        points, opponent_points, games = head_to_head(archive, name, opponent)
+        print(f"\nDirekter Vergleich mit {opponent}: {points} - "
+              f"{opponent_points} aus {len(games)} Partien")
+
+    return None
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,16 @@ Data is stored locally in the form of json files. Intermediate standings and
 pairings for the next round can be exported as ASCII text documents.
 
 This is the main file of the application. Further modules are:
+    - analysis.py
+    - archive.py
+    - daemon.py
     - datastorage.py
+    - liveresults.py
+    - playerindex.py
+    - ratingsync.py
+    - scheduleindex.py
+    - scheduler.py
+    - teamtournament.py
     - tournament.py
     - webscraping.py
 
@@ -26,6 +35,10 @@ enter_results(tournament)
     Updates the tournament data and returns them as a dictionary to the calling
     function.
 
+enter_team_results(tournament)
+    Lets the user chose a round, a match and a board of a team tournament and
+    enters the result of that board.
+
 print_standings_menu(tournament)
     Lets the user enter a round, calculates the scores of all players after
     that round and displays the intermediate standings after that round. Always
@@ -35,19 +48,62 @@ export_pairings(tournament)
     Lets the user chose a round, then writes the intermediate standings
     before that round and the pairings of the round into an ASCII text file.
 
+player_statistics_menu()
+    Lets the user enter a player name and prints the games, score and
+    performance of that player from all archived tournaments.
+
+live_results_menu(tournament)
+    Lets the user enter the name of a results file (or named pipe) and
+    enters the results from that file while it is growing during the round.
+
+analysis_menu(tournament)
+    Lets the user enter the number of places k and prints who can still
+    finish among the first k players and how many points they need.
+
+rating_sync_menu(tournament)
+    Updates the ratings of all players in all stored tournaments and reloads
+    the current tournament.
+
+schedule_menu(tournament)
+    Prints the schedule of a player, the games of two players against each
+    other, or exports the schedules of all players into a text file.
+
 main_menu()
     Prints the main menu and lets the user chose a menu item.
 
 main()
     Calls "main_menu" in an infinite loop. The user can quit the program in the
-    main menu by call to sys.exit().
+    main menu by call to sys.exit(). If arguments are given, they are executed
+    as a single command instead (see daemon.py), by the daemon if it is
+    running, or the daemon is started with the argument "daemon".
 """
 
 
 import sys
 
+from daemon import send_command
+
+# A single command is sent to a running daemon before the modules of the menu
+# are imported, so that the client only has to import socket and json
+if __name__ == "__main__" and sys.argv[1:] and sys.argv[1:] != ["daemon"]:
+    answer = send_command(sys.argv[1:])
+    if answer is not None:
+        print(answer, end="")
+        sys.exit()
+
+from analysis import print_analysis
+from archive import load_archive, print_player_statistics
+from daemon import run_daemon, run_command
+from datastorage import get_filename, read_tournament_data
+from liveresults import follow_results
+from ratingsync import sync_ratings
+from scheduleindex import get_meetings, print_player_schedule, \
+        write_schedules_to_file
+from rendercache import clear_render_cache
+from teamtournament import create_new_team_tournament, print_team_pairings, \
+        update_board_result, print_team_standings, write_team_pairings_to_file
 from tournament import create_new_tournament, load_tournament, print_pairings,\
-        update_result, refresh_scores, print_standings, write_pairings_to_file
+        update_result, print_standings, write_pairings_to_file, number_rounds
 
 
 # Define global variable to hold the current tournament data
@@ -62,6 +118,8 @@ def enter_results(tournament):
     if not tournament:
         print("\nBitte laden Sie zunächst ein Turnier, oder legen Sie ein neues"
               " Turnier an.")
+    elif tournament.get("type") == "team":
+        return enter_team_results(tournament)
     else:
         print("\nBitte waehlen Sie die Runde, für die Sie Ergebnisse eingeben",
               "möchten.")
@@ -69,7 +127,7 @@ def enter_results(tournament):
             R = input("\nRunde > ")
             if R.isnumeric():
                 R = int(R)
-                if 0 < R <= len(tournament["player_list"])-1:
+                if 0 < R <= number_rounds(tournament):
                     break
 
         print()
@@ -99,6 +157,53 @@ def enter_results(tournament):
         return tournament
 
 
+def enter_team_results(tournament):
+    """Lets the user chose a round R of a team tournament, prints the matches
+    of that round and lets the user chose a match and a board, then asks for
+    the result on that board and updates the tournament data accordingly.
+    Returns the updated tournament data.
+    """
+    print("\nBitte waehlen Sie die Runde, für die Sie Ergebnisse eingeben",
+          "möchten.")
+    while True:
+        R = input("\nRunde > ")
+        if R.isnumeric():
+            R = int(R)
+            if 0 < R <= number_rounds(tournament):
+                break
+
+    print()
+    print_team_pairings(tournament, R)
+
+    while True:
+        print("Bitte waehlen Sie einen Mannschaftskampf, oder geben Sie eine 0",
+              "ein, um\nzum Hauptmenue zurueckzukehren.")
+        match = input("\nMannschaftskampf > ")
+        if match.isnumeric():
+            match = int(match)
+            if 0 <= match <= len(tournament["player_list"])/2:
+                break
+    if match == 0:
+        return tournament
+
+    while True:
+        board = input("Brett > ")
+        if board.isnumeric():
+            board = int(board)
+            if 0 < board <= tournament["boards"]:
+                break
+
+    print("\nBitte geben Sie das Ergebnis ein (1,0,=,+,- oder C für eine "
+          "ausgefallene Partie.)\n")
+    while True:
+        result = input("Ergebnis > ")
+        if result and result[0] in "10=+-C":
+            result = result[0]
+            break
+
+    return update_board_result(tournament, R, match, board, result)
+
+
 def print_standings_menu(tournament):
     """Lets the user chose a round after which the intermediate standings shall
     be displayed, calculates the scores of all players after that round and
@@ -118,11 +223,13 @@ def print_standings_menu(tournament):
             R = input("Runde > ")
             if R.isnumeric():
                 R = int(R)
-                if 0 < R <= len(tournament["player_list"])-1:
+                if 0 < R <= number_rounds(tournament):
                     break
 
-        tournament = refresh_scores(tournament, R)
-        print_standings(tournament, R)
+        if tournament.get("type") == "team":
+            print_team_standings(tournament, R)
+        else:
+            print_standings(tournament, R)
 
         return None
 
@@ -140,10 +247,13 @@ def export_pairings(tournament):
         R = input("Runde > ")
         if R.isnumeric():
             R = int(R)
-            if 0 < R <= len(tournament["player_list"])-1:
+            if 0 < R <= number_rounds(tournament):
                 break
 
-    error = write_pairings_to_file(tournament, R)
+    if tournament.get("type") == "team":
+        error = write_team_pairings_to_file(tournament, R)
+    else:
+        error = write_pairings_to_file(tournament, R)
 
     if error == "OK":
         return None
@@ -153,19 +263,205 @@ def export_pairings(tournament):
         return None
 
 
+def player_statistics_menu():
+    """Updates the archive of all stored tournaments, lets the user enter a
+    player name and optionally an opponent, then prints the archived games,
+    the score and the performance rating of that player.
+    """
+    tmp_str = "Spielerstatistik aus allen gespeicherten Turnieren"
+    print("\n\n" + tmp_str)
+    print("=" * len(tmp_str))
+
+    archive = load_archive()
+
+    while True:
+        name = input("\nSpieler (ENTER: Abbruch) > ").strip()
+        if not name:
+            return None
+        if name in archive["index"]["player"]:
+            break
+        print("Dieser Spieler ist im Archiv nicht vorhanden.")
+    opponent = input("Gegner (optional)....... > ").strip()
+
+    print_player_statistics(archive, name, opponent)
+
+    return None
+
+
+def live_results_menu(tournament):
+    """Lets the user enter the name of a file with results that is written by
+    electronic boards or a results app during the round, or of a named pipe
+    (FIFO), then enters the results until the user presses Ctrl+C or the
+    pipe is closed. Returns the updated tournament data.
+    """
+    if not tournament:
+        print("\nBitte laden Sie zunächst ein Turnier, oder legen Sie ein neues"
+              " Turnier an.")
+        return tournament
+    if tournament.get("type") == "team":
+        print("\nErgebnisse können nur für Einzelturniere live eingelesen",
+              "werden.")
+        return tournament
+
+    tmp_str = "Ergebnisse live einlesen"
+    print("\n\n" + tmp_str)
+    print("=" * len(tmp_str))
+    print("\nJede Zeile der Datei enthält ein Ergebnis: Runde Partie Ergebnis,",
+          "\nz.B. '3 2 =' für ein Remis in Partie 2 der Runde 3.\n")
+
+    while True:
+        source = input("Ergebnisdatei oder FIFO > ").strip()
+        if source:
+            break
+
+    result = follow_results(tournament, source)
+
+    if isinstance(result, Exception):
+        print(f"\n\nERROR: {result}\n\n")
+        return tournament
+
+    return result
+
+
+def analysis_menu(tournament):
+    """Lets the user enter the number of places k (ENTER: 1, i.e. the
+    tournament winner), then prints for every player whether a place among
+    the first k can still be reached and how many points are needed for it.
+    Always returns None.
+    """
+    if not tournament:
+        print("\nBitte laden Sie zunächst ein Turnier, oder legen Sie ein neues"
+              " Turnier an.")
+        return None
+    if tournament.get("type") == "team":
+        print("\nDie Analyse ist nur für Einzelturniere möglich.")
+        return None
+
+    tmp_str = "Titelchancen analysieren"
+    print("\n\n" + tmp_str)
+    print("=" * len(tmp_str))
+
+    while True:
+        k = input("\nPlätze (ENTER: 1) > ").strip()
+        if not k:
+            k = 1
+            break
+        if k.isnumeric() and int(k) > 0:
+            k = int(k)
+            break
+
+    print_analysis(tournament, k)
+
+    return None
+
+
+def rating_sync_menu(tournament):
+    """Updates DWZ and ELO of all players in all stored tournaments from the
+    DSB database and prints which tournaments have changed. The current
+    tournament is read again, so that it shows the new ratings. Returns the
+    current tournament data.
+    """
+    tmp_str = "Wertungszahlen aller Turniere aktualisieren"
+    print("\n\n" + tmp_str)
+    print("=" * len(tmp_str))
+    print("\nBitte warten, die DSB-Datenbank wird abgefragt ...")
+
+    names, downloads, changed, errors = sync_ratings()
+
+    print(f"\n{names} Spieler gesucht, {downloads} Seiten neu geladen,",
+          f"{len(changed)} Turniere geändert.")
+    for name in changed:
+        print(f"    {name}")
+    for error in errors:
+        print(f"ERROR: {error}")
+
+    if tournament and tournament["name"] in changed:
+        reloaded = read_tournament_data(get_filename(tournament))
+        if not isinstance(reloaded, Exception):
+            clear_render_cache(reloaded)
+            return reloaded
+
+    return tournament
+
+
+def schedule_menu(tournament):
+    """Lets the user chose a player (or 0 for all players) and optionally an
+    opponent. Prints the rounds, colours and boards of all games of the
+    player against that opponent, or the complete schedule of the player. For
+    0, the schedules of all players are written into a text file. Always
+    returns None.
+    """
+    if not tournament:
+        print("\nBitte laden Sie zunächst ein Turnier, oder legen Sie ein neues"
+              " Turnier an.")
+        return None
+    if tournament.get("type") == "team":
+        print("\nSpielpläne gibt es nur für Einzelturniere.")
+        return None
+
+    tmp_str = "Spielpläne der Spieler"
+    print("\n\n" + tmp_str)
+    print("=" * len(tmp_str))
+    print("\nBitte waehlen Sie einen Spieler (Nummer aus der Teilnehmerliste),",
+          "\noder geben Sie eine 0 ein, um die Spielpläne aller Spieler in eine",
+          "\nTextdatei zu exportieren.")
+
+    number_players = len(tournament["player_list"])
+    while True:
+        player = input("\nSpieler > ").strip()
+        if player.isnumeric() and int(player) <= number_players:
+            player = int(player)
+            break
+
+    if player == 0:
+        error = write_schedules_to_file(tournament)
+        if error != "OK":
+            print("\n\nERROR: Beim Datenexport in eine Textdatei ist ein",
+                  f"Fehler aufgetreten.\n{error}\n\n")
+        return None
+
+    while True:
+        opponent = input("Gegner (ENTER: alle) > ").strip()
+        if not opponent or (opponent.isnumeric()
+                            and 0 < int(opponent) <= number_players
+                            and int(opponent) != player):
+            break
+
+    if not opponent:
+        print_player_schedule(tournament, player-1)
+        return None
+
+    name = tournament["player_list"][player-1]["name"]
+    opponent_name = tournament["player_list"][int(opponent)-1]["name"]
+    print(f"\n{name} gegen {opponent_name}:")
+    for R, colour, board in get_meetings(tournament, player-1,
+                                         int(opponent)-1):
+        print(f"Runde {R:2d}, Brett {board:2d}, "
+              f"{'Weiß' if colour == 'W' else 'Schwarz'}")
+
+    return None
+
+
 def main_menu():
     """Prints the main menu and lets the user chose a menu item.
     """
     # current_tournament shall be changed in this function
     global current_tournament
 
+    # "0" always ends the program, new menu items are added before it
     menu = {
                 "1": "Neues Turnier anlegen",
                 "2": "Bestehendes Turnier laden",
                 "3": "Paarungen anzeigen und Ergebnisse eingeben",
                 "4": "Tabelle anzeigen",
                 "5": "Zwischenstand und Paarungen als Textdatei exportieren",
-                "6": "Programm beenden"
+                "6": "Spielerstatistik aus allen Turnieren anzeigen",
+                "7": "Ergebnisse live aus einer Datei einlesen",
+                "8": "Neues Mannschaftsturnier anlegen",
+                "9": "Titelchancen analysieren",
+                "10": "Wertungszahlen aller Turniere aktualisieren",
+                "11": "Spielpläne der Spieler anzeigen",
+                "0": "Programm beenden"
            }
 
     print("\n"*5)
@@ -184,7 +480,7 @@ def main_menu():
 
     while True:
         choice = input("\nBitte waehlen Sie einen Menuepunkt > ")
-        if choice in list("123456"):
+        if choice in menu:
             if choice == "1":
                 current_tournament = create_new_tournament()
             elif choice == "2":
@@ -196,15 +492,47 @@ def main_menu():
             elif choice == "5":
                 export_pairings(current_tournament)
             elif choice == "6":
+                player_statistics_menu()
+            elif choice == "7":
+                current_tournament = live_results_menu(current_tournament)
+            elif choice == "8":
+                current_tournament = create_new_team_tournament()
+            elif choice == "9":
+                analysis_menu(current_tournament)
+            elif choice == "10":
+                current_tournament = rating_sync_menu(current_tournament)
+            elif choice == "11":
+                schedule_menu(current_tournament)
+            elif choice == "0":
                 sys.exit()
         break # Leave input loop if user entered a valid choice
 
 
 def main():
-    """Calls the function main_menu in an infinite loop.
+    """Calls the function main_menu in an infinite loop. With arguments, only
+    the command given by the arguments is executed: "daemon" starts the
+    daemon, every other command is sent to the daemon, or executed here if
+    no daemon is running. The menu ends at the end of the input.
     """
-    while True:
-        main_menu()
+    if sys.argv[1:] == ["daemon"]:
+        error = run_daemon()
+        if error != "OK":
+            print(f"\n\nERROR: {error}\n\n")
+    elif sys.argv[1:]:
+        answer = send_command(sys.argv[1:])
+        if answer is None and sys.argv[1:] == ["stop"]:
+            answer = "Es läuft kein Daemon.\n"
+        elif answer is None:
+            answer = run_command(sys.argv[1:])
+        print(answer, end="")
+    else:
+        while True:
+            try:
+                main_menu()
+            except EOFError:
+                # End of the input, e.g. Ctrl+D or the end of a script
+                print()
+                sys.exit()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+=========
+daemon.py
+=========
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Carl-Friedrich can also be used from scripts or several terminals with single
+commands instead of the menu, e.g.
+
+    python carl-friedrich.py pairings Vereinsmeisterschaft_2021 3
+    python carl-friedrich.py result Vereinsmeisterschaft_2021 3 2 =
+
+Every such call would have to import all modules and read the tournament
+anew. The daemon ("python carl-friedrich.py daemon") keeps the tournaments,
+the render cache and the indexes in memory and waits for commands on a Unix
+socket in the cache folder. If the daemon is running, carl-friedrich.py only
+sends the command to the daemon and prints the answer; otherwise it executes
+the command itself with the same function execute_command.
+
+The modules of Carl-Friedrich are only imported by the functions that execute
+commands, so that a client that only sends a command to the daemon starts
+without importing anything but the socket and json modules.
+
+A client sends the command as a json list of strings in a single line, the
+daemon answers with the output of the command as text and closes the
+connection. Commands are executed one after the other, so they never change
+a tournament at the same time. A tournament is read again if its file has
+been changed by another program, e.g. by the menu.
+
+Commands:
+=========
+    list                                    stored tournaments
+    players <tournament>                    player list
+    pairings <tournament> <R>               pairings of round R
+    standings <tournament> <R>              standings after round R
+    result <tournament> <R> <game> [<board>] <result>
+                                            enter a result
+    schedule <tournament> <player>          schedule of a player (number)
+    analysis <tournament> [<k>]             who can still finish in the top k
+    stop                                    stop the daemon
+
+    <tournament> is the file name with or without ".json".
+
+Functions in daemon.py:
+=======================
+get_tournament(filename, rounds)
+    Returns the tournament data from memory, reading them if necessary.
+
+execute_command(args)
+    Executes a command and prints its output.
+
+run_command(args)
+    Executes the command and returns the text that the command has printed.
+
+run_daemon()
+    Waits for commands on the socket and executes them until "stop".
+
+send_command(args)
+    Sends a command to the running daemon and returns the answer, or None if
+    no daemon is running.
+
+main()
+    Starts the daemon.
+"""
+
+
+import contextlib
+import io
+import json
+import os
+import socket
+
+
+# In the cache folder CACHE_PATH of datastorage.py, which is not imported here
+SOCKET_FILE = "./data/cache/carl-friedrich.sock"
+# Maximum length of a command in bytes
+MAX_COMMAND_SIZE = 4096
+# Seconds the daemon waits for the command or the reading of the answer by a
+# client, so that a client that connects and sends nothing cannot block it
+CLIENT_TIMEOUT = 5.0
+
+# Tournaments kept in memory: file name -> (time of last change, data)
+tournaments = dict()
+# True in the daemon, which keeps complete tournaments for later commands
+keep_tournaments = False
+
+
+def get_tournament(filename, rounds = None):
+    """Returns the tournament data for a file name, or the error message. The
+    data are read only if they are not in memory yet or if the file has been
+    changed since they were read.
+
+    A command that only shows data needs only the first "rounds" rounds (see
+    read_tournament_data). Without the daemon, only this part of the file is
+    read and not kept, because the program ends after the command anyway.
+    """
+    from datastorage import list_tournament_files, read_tournament_data
+    from rendercache import clear_render_cache
+
+    modified = list_tournament_files().get(filename)
+    if modified is None:
+        return Exception(f"Turnier {filename} nicht gefunden")
+
+    if rounds is not None and not keep_tournaments and \
+            filename not in tournaments:
+        tournament = read_tournament_data(filename, rounds)
+        if not isinstance(tournament, Exception):
+            clear_render_cache(tournament)
+        return tournament
+
+    if filename not in tournaments or tournaments[filename][0] != modified:
+        tournament = read_tournament_data(filename)
+        if isinstance(tournament, Exception):
+            return tournament
+        clear_render_cache(tournament)
+        tournaments[filename] = (modified, tournament)
+
+    return tournaments[filename][1]
+
+
+def execute_command(args):
+    """Executes the command in the list of strings "args" (see above) and
+    prints its output. Returns "OK", or an error message for unknown commands
+    and invalid arguments.
+    """
+    # Imported here, see above
+    from analysis import print_analysis
+    from datastorage import list_tournament_files
+    from scheduleindex import print_player_schedule
+    from teamtournament import print_team_pairings, print_team_standings, \
+                               update_board_result
+    from tournament import RESULT2POINTS, number_rounds, get_round, \
+                           print_pairings, update_result, print_standings
+    from webscraper import print_player_list
+
+    if not args:
+        return "Kein Befehl angegeben"
+    command, args = args[0], args[1:]
+
+    if command == "list":
+        for filename in sorted(list_tournament_files()):
+            print(filename[:-len(".json")])
+        return "OK"
+
+    if not args:
+        return f"Befehl {command} braucht ein Turnier"
+    filename = args[0] if args[0].endswith(".json") else args[0] + ".json"
+    args = args[1:]
+    # Players, pairings and standings of round R need no later rounds
+    if command == "players":
+        tournament = get_tournament(filename, 0)
+    elif command in ("pairings", "standings") and args and \
+            args[0].isnumeric():
+        tournament = get_tournament(filename, int(args[0]))
+    else:
+        tournament = get_tournament(filename)
+    if isinstance(tournament, Exception):
+        return tournament
+    is_team = tournament.get("type") == "team"
+
+    if not all(arg.isnumeric() for arg in args[:-1]) or \
+            (args and command != "result" and not args[-1].isnumeric()):
+        return "Runde, Partie, Brett und Spieler müssen Zahlen sein"
+    numbers = [int(arg) for arg in args if arg.isnumeric()]
+    if numbers and command in ("pairings", "standings", "result") \
+            and not 0 < numbers[0] <= number_rounds(tournament):
+        return f"Runde {numbers[0]} gibt es nicht"
+
+    if command == "players" and not args:
+        print_player_list(tournament["player_list"])
+    elif command == "pairings" and len(args) == 1:
+        if is_team:
+            print_team_pairings(tournament, numbers[0])
+        else:
+            print_pairings(tournament, numbers[0])
+    elif command == "standings" and len(args) == 1:
+        if is_team:
+            print_team_standings(tournament, numbers[0])
+        else:
+            print_standings(tournament, numbers[0])
+    elif command == "result" and len(args) == (4 if is_team else 3):
+        R, game = numbers[:2]
+        result = args[-1]
+        if result not in RESULT2POINTS or result == "_":
+            return f"Unbekanntes Ergebnis {result}"
+        if not 0 < game <= len(get_round(tournament, R)):
+            return f"Partie {game} gibt es nicht"
+        if is_team:
+            if not 0 < numbers[2] <= tournament["boards"]:
+                return f"Brett {numbers[2]} gibt es nicht"
+            update_board_result(tournament, R, game, numbers[2], result)
+        else:
+            update_result(tournament, R, game, result)
+        # The change has been written by this program, so there is no need
+        # to read the tournament again for the next command
+        tournaments[filename] = (list_tournament_files().get(filename),
+                                 tournament)
+    elif command == "schedule" and len(args) == 1 and not is_team:
+        if not 0 < numbers[0] <= len(tournament["player_list"]):
+            return f"Spieler {numbers[0]} gibt es nicht"
+        print_player_schedule(tournament, numbers[0] - 1)
+    elif command == "analysis" and len(args) <= 1 and not is_team:
+        print_analysis(tournament, numbers[0] if numbers else 1)
+    else:
+        return f"Unbekannter Befehl oder falsche Argumente: {command}"
+
+    return "OK"
+
+
+def run_command(args):
+    """Executes the command in "args" with the output redirected into a
+    string and returns that string, followed by the error message if the
+    command has failed.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            error = execute_command(args)
+        except Exception as e:
+            error = e
+    text = output.getvalue()
+    if error != "OK":
+        text += f"\nERROR: {error}\n"
+
+    return text
+
+
+def run_daemon():
+    """Creates the socket (readable only for the user who started the daemon)
+    and executes the commands of all clients one after the other until a
+    client sends "stop". A socket file left over from a daemon that has
+    crashed is removed. A client that closes the connection before it has
+    received the answer (e.g. after Ctrl+C) does not stop the daemon, and a
+    client that sends no command within CLIENT_TIMEOUT seconds is skipped.
+    Returns "OK" or the error message.
+    """
+    global keep_tournaments
+
+    if send_command(["list"]) is not None:
+        return "Der Daemon läuft bereits"
+    keep_tournaments = True
+    # The daemon imports the modules for all commands once at the start, so
+    # that the first command is as fast as all others
+    import analysis
+    import scheduleindex
+    import teamtournament
+    import tournament
+    import webscraper
+
+    try:
+        os.makedirs(os.path.dirname(SOCKET_FILE), exist_ok = True)
+        if os.path.exists(SOCKET_FILE):
+            os.remove(SOCKET_FILE)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(SOCKET_FILE)
+        os.chmod(SOCKET_FILE, 0o600)
+        server.listen()
+    except Exception as e:
+        return e
+
+    print(f"Carl-Friedrich wartet auf Befehle ({SOCKET_FILE}),",
+          "Ende mit Strg+C.")
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                connection.settimeout(CLIENT_TIMEOUT)
+                try:
+                    request = connection.makefile("rb").readline(
+                            MAX_COMMAND_SIZE)
+                    args = json.loads(request.decode("utf-8"))
+                except socket.timeout:
+                    # The client has not sent a complete command in time
+                    continue
+                except Exception:
+                    continue
+                try:
+                    if args == ["stop"]:
+                        connection.sendall(
+                                "Daemon beendet.\n".encode("utf-8"))
+                        break
+                    connection.sendall(run_command(args).encode("utf-8"))
+                except OSError:
+                    # The client has gone, the next one is served anyway
+                    pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(SOCKET_FILE)
+
+    return "OK"
+
+
+def send_command(args):
+    """Sends the command "args" (list of strings) to the daemon and returns
+    its answer as text. Returns None if no daemon is running, so that the
+    caller can execute the command itself.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(SOCKET_FILE)
+            client.sendall((json.dumps(args) + "\n").encode("utf-8"))
+            answer = bytearray()
+            while True:
+                data = client.recv(65536)
+                if not data:
+                    break
+                answer.extend(data)
+    except OSError:
+        return None
+
+    return answer.decode("utf-8")
+
+
+def main():
+    """Starts the daemon, like "python carl-friedrich.py daemon".
+    """
+    error = run_daemon()
+    if error != "OK":
+        print(f"\n\nERROR: {error}\n\n")
+
+
+if __name__ == "__main__":
+    main()
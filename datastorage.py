@@ -10,74 +10,527 @@ Email  : janzen (at) gmx.net
 Date   : 2021-04-07
 Version: 1.0
 
-Implements storage of chess tournament data (general, pairings, results) as
-json files.
+Implements storage of chess tournament data (general, pairings, results). Two
+storage backends are available:
+    - "json": one json file per tournament in ./data (default)
+    - "sqlite": one SQLite database ./data/carl-friedrich.sqlite with indexed
+      tables for tournaments, players and games. Single results are updated
+      as single rows, and the database runs in WAL mode, so that other
+      programs can read while results are being entered.
+
+The backend is chosen with the environment variable CARL_FRIEDRICH_STORAGE or
+with set_storage_backend. An unknown value of the environment variable is
+reported on import and the json backend is used. In both backends a tournament is identified by its
+file name, i.e. the tournament name with "_" instead of blanks plus ".json".
+Existing json files are copied into the database with
+"python datastorage.py migrate".
+
+Json files begin with an entry "_sections", a table with the positions of the
+general data, the player list and every round in the file:
+    {"_sections": {"end": E, "header": [A, B], "player_list": [A, B],
+                   "rounds": [[A, B], ...]}, "name": ..., "player_list": [...],
+     "rounds": [[...], ...]}
+All positions are byte offsets written with a fixed width (padded with blanks,
+which is valid json), so the table can be written before the positions of the
+following sections are known. "end" is the end of the table itself. With the
+table, a reader can read only the general data, the players or the first R
+rounds without reading and parsing the rest of the file. Files without the
+table (written by older versions) are read completely.
 
 Functions in datastorage.py:
 ============================
+set_storage_backend(backend)
+    Selects the storage backend, "json" or "sqlite".
+
 write_tournament_data(tournament)
-    Writes the data contained in the argument tournament into a json file.
+    Writes the data contained in the argument tournament into the storage.
+
+read_tournament_data(filename, rounds)
+    Reads the tournament "filename" from the storage, optionally only the
+    first "rounds" rounds.
 
-read_tournament_data(filename)
-    Reads the file "filename" from a json file.
+update_game_data(tournament, R, game)
+    Writes the result of a single game to the storage.
+
+list_tournament_files()
+    Returns a dictionary of all stored tournaments and the time of their last
+    change.
 
 get_tournament_filename()
-    Lists the names of all json files in the directory ./data.
+    Lists the names of all stored tournaments and lets the user chose one.
+
+write_json_tournament(tournament), read_json_tournament(filename, rounds),
+update_json_game(tournament, R, game), list_json_tournaments()
+    Implementation of the json backend.
+
+format_json_sections(tournament)
+    Returns the json text of a tournament with the table of its sections.
+
+read_json_sections(fin, rounds)
+    Reads the general data, the player list and the first rounds of an open
+    json file with the help of the table of sections.
+
+get_database()
+    Opens the SQLite database and creates the tables, if necessary.
+
+write_sqlite_tournament(tournament), read_sqlite_tournament(filename, rounds),
+update_sqlite_game(tournament, R, game), list_sqlite_tournaments()
+    Implementation of the sqlite backend.
+
+migrate_json_to_sqlite()
+    Copies all json files from ./data into the SQLite database.
+
+write_pairing_table(number_players, table)
+    Writes the Berger table for number_players into its own json file in
+    ./data/cache.
+
+read_pairing_table(number_players)
+    Reads the cached Berger table for number_players from ./data/cache.
 
 switch_stdout(filename = "")
     Switches the standard output between a file "filename" and the screen.
+
 main()
-    Just a placeholder, does nothing.
+    Copies all json files into the SQLite database if called with the
+    argument "migrate", otherwise does nothing.
 """
 
 
 import json
 import os
+import sqlite3
 import string
 import sys
+import time
 
 
 DATA_PATH = "./data/"
+# Cached data that can be recreated at any time, kept in a subfolder so that
+# its json files do not show up in the list of tournaments
+CACHE_PATH = DATA_PATH + "cache/"
+# One file per number of players, so that only the needed table is read
+PAIRING_TABLE_FILE = CACHE_PATH + "berger_{}.json"
+DATABASE_FILE = DATA_PATH + "carl-friedrich.sqlite"
+
+# Beginning of a json file with a table of sections, and the number of
+# characters of every position in that table
+SECTIONS_START = '{"_sections": {"end": '
+SECTION_WIDTH = 10
+
+# Storage backend, "json" or "sqlite"
+storage_backend = os.environ.get("CARL_FRIEDRICH_STORAGE", "json")
+# Open connection to the SQLite database, see get_database
+database = None
+
+# Player fields that get a column of their own in the SQLite database, all
+# other fields (e.g. the players of a team) are stored as json
+PLAYER_COLUMNS = ("name", "DWZ", "evals", "ELO", "club")
+
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tournaments (
+    filename   TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    venue      TEXT,
+    last_round TEXT,
+    modified   REAL NOT NULL,
+    header     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    filename TEXT NOT NULL REFERENCES tournaments ON DELETE CASCADE,
+    number   INTEGER NOT NULL,
+    name     TEXT NOT NULL,
+    DWZ      INTEGER,
+    evals    INTEGER,
+    ELO      INTEGER,
+    club     TEXT,
+    extra    TEXT,
+    PRIMARY KEY (filename, number)
+);
+CREATE TABLE IF NOT EXISTS games (
+    filename TEXT NOT NULL REFERENCES tournaments ON DELETE CASCADE,
+    round    INTEGER NOT NULL,
+    game     INTEGER NOT NULL,
+    white    INTEGER NOT NULL,
+    black    INTEGER NOT NULL,
+    result   TEXT NOT NULL,
+    PRIMARY KEY (filename, round, game)
+);
+CREATE INDEX IF NOT EXISTS players_by_name ON players (name);
+CREATE INDEX IF NOT EXISTS players_by_club ON players (club);
+CREATE INDEX IF NOT EXISTS games_by_white ON games (filename, white);
+CREATE INDEX IF NOT EXISTS games_by_black ON games (filename, black);
+"""
+
+
+def set_storage_backend(backend):
+    """Selects the storage backend, "json" or "sqlite", for all following
+    reads and writes. Returns "OK", or an error message for an unknown
+    backend.
+    """
+    global storage_backend
+
+    if backend not in STORAGE_BACKENDS:
+        return f"Unbekannte Datenablage: {backend}"
+    storage_backend = backend
+
+    return "OK"
+
+
+def get_filename(tournament):
+    """Returns the file name that identifies a tournament in all backends.
+    """
+    return tournament["name"].replace(" ", "_") + ".json"
 
 
 def write_tournament_data(tournament):
-    """Writes the tournament data (general, pairings, results, NO standings!)
-    to a json file. Returns "OK" if no error occurred, otherwise returns the
+    """Writes the tournament data (general, pairings, results) to the selected
+    storage backend. Returns "OK" if no error occurred, otherwise returns the
     error message.
     """
-    filename = DATA_PATH + tournament["name"].replace(" ", "_") + ".json"
+    return STORAGE_BACKENDS[storage_backend]["write"](tournament)
+
+
+def read_tournament_data(filename, rounds = None):
+    """Reads tournament data (general, player list, pairings, results) from
+    the selected storage backend into a dictionary. If "rounds" is given,
+    only the first "rounds" rounds are read (e.g. 0 for general data and
+    players only); such partial data must never be written back. Returns the
+    dictionary if no error occurred, otherwise returns the error message.
+    """
+    return STORAGE_BACKENDS[storage_backend]["read"](filename, rounds)
+
+
+def update_game_data(tournament, R, game):
+    """Writes the result of game number "game" in round R (both 1-based) to
+    the selected storage backend. The json backend has to write the whole
+    file, the sqlite backend only changes a single row. Returns "OK" if no
+    error occurred, otherwise returns the error message.
+    """
+    return STORAGE_BACKENDS[storage_backend]["update"](tournament, R, game)
+
+
+def list_tournament_files():
+    """Returns a dictionary with the file names of all stored tournaments as
+    keys and the time of their last change as values.
+    """
+    return STORAGE_BACKENDS[storage_backend]["list"]()
+
+
+def write_json_tournament(tournament):
+    """Writes the tournament data (general, pairings, results, NO standings!)
+    to a json file with a table of its sections. Returns "OK" if no error
+    occurred, otherwise returns the error message.
+    """
+    filename = DATA_PATH + get_filename(tournament)
     try:
+        text = format_json_sections(tournament)
         with open(filename, "w") as fout:
-            fout.write(json.dumps(tournament))
+            fout.write(text)
     except Exception as e:
         return e
 
     return "OK"
 
 
-def read_tournament_data(filename):
+def format_json_sections(tournament):
+    """Returns the tournament data as json text, beginning with the table of
+    sections described above. json.dumps only writes ASCII characters, so the
+    positions in the text are also the byte offsets in the file.
+    """
+    header = json.dumps({key: value for key, value in tournament.items()
+                         if key not in ("_sections", "player_list",
+                                        "rounds")})[1:-1]
+    players = json.dumps(tournament["player_list"])
+    rounds = [json.dumps(pairings) for pairings in tournament["rounds"]]
+
+    def format_table(end, sections):
+        # All positions have the same width, so the length of the table does
+        # not depend on the positions
+        def pair(start, stop):
+            return f"[{start:{SECTION_WIDTH}d}, {stop:{SECTION_WIDTH}d}]"
+        return (SECTIONS_START + f"{end:{SECTION_WIDTH}d}" +
+                ', "header": ' + pair(*sections["header"]) +
+                ', "player_list": ' + pair(*sections["player_list"]) +
+                ', "rounds": [' +
+                ", ".join(pair(*section) for section in sections["rounds"]) +
+                "]}")
+
+    dummy = {"header": (0, 0), "player_list": (0, 0),
+             "rounds": [(0, 0)] * len(rounds)}
+    end = len(format_table(0, dummy))
+
+    position = end + len(", ")
+    sections = {"header": (position, position + len(header))}
+    position += len(header) + len(', "player_list": ')
+    sections["player_list"] = (position, position + len(players))
+    position += len(players) + len(', "rounds": [')
+    sections["rounds"] = list()
+    for text in rounds:
+        sections["rounds"].append((position, position + len(text)))
+        position += len(text) + len(", ")
+
+    return (format_table(end, sections) + ", " + header +
+            ', "player_list": ' + players +
+            ', "rounds": [' + ", ".join(rounds) + "]}")
+
+
+def read_json_tournament(filename, rounds = None):
     """Reads tournament data (general, player list, pairings, results, but no
-    standings) from a json file into a dictionary. Returns the dictionary if
-    no error occurred, otherwise returns the error message.
+    standings) from a json file into a dictionary. If only the first "rounds"
+    rounds are needed and the file has a table of sections, only these parts
+    of the file are read. Returns the dictionary if no error occurred,
+    otherwise returns the error message.
     """
     filename = DATA_PATH + filename
     try:
-        with open(filename, "r") as fin:
+        with open(filename, "rb") as fin:
+            start = fin.read(len(SECTIONS_START))
+            if rounds is not None and start == SECTIONS_START.encode():
+                return read_json_sections(fin, rounds)
+            fin.seek(0)
             tournament = json.loads(fin.read())
     except Exception as e:
         return e
 
+    tournament.pop("_sections", None)
+    if rounds is not None:
+        tournament["rounds"] = tournament["rounds"][:rounds]
+
     return tournament
 
 
+def read_json_sections(fin, rounds):
+    """Reads the table of sections from the open json file "fin" (positioned
+    behind SECTIONS_START), then reads and parses only the general data, the
+    player list and the first "rounds" rounds, which are stored one after
+    the other and can therefore be read at once. Returns the dictionary,
+    errors are passed on to the calling function.
+    """
+    def read_section(start, end):
+        fin.seek(start)
+        return fin.read(end - start).decode("ascii")
+
+    # Read up to the first comma, so that files with a different width of the
+    # positions can be read as well
+    end = int(fin.read(32).split(b",")[0])
+    sections = json.loads(read_section(len('{"_sections": '), end))
+
+    tournament = json.loads("{" + read_section(*sections["header"]) + "}")
+    tournament["player_list"] = json.loads(
+            read_section(*sections["player_list"]))
+
+    positions = sections["rounds"][:rounds]
+    if positions:
+        tournament["rounds"] = json.loads(
+                "[" + read_section(positions[0][0], positions[-1][1]) + "]")
+    else:
+        tournament["rounds"] = list()
+
+    return tournament
+
+
+def update_json_game(tournament, R, game):
+    """A json file can only be written as a whole, so the complete tournament
+    is written again.
+    """
+    return write_json_tournament(tournament)
+
+
+def list_json_tournaments():
+    """Returns a dictionary with all json files in the data folder and their
+    modification times. Returns an empty dictionary if the folder is missing.
+    """
+    try:
+        return {f: os.path.getmtime(DATA_PATH + f)
+                for f in os.listdir(DATA_PATH) if f.endswith(".json")}
+    except Exception:
+        return dict()
+
+
+def get_database():
+    """Returns the connection to the SQLite database. The database is opened
+    on first use, switched to WAL mode (readers are not blocked while a result
+    is written) and the tables and indexes are created if they do not exist.
+    """
+    global database
+
+    if database is None:
+        os.makedirs(DATA_PATH, exist_ok=True)
+        database = sqlite3.connect(DATABASE_FILE)
+        database.execute("PRAGMA journal_mode=WAL")
+        database.execute("PRAGMA foreign_keys=ON")
+        database.executescript(DATABASE_SCHEMA)
+
+    return database
+
+
+def write_sqlite_tournament(tournament):
+    """Writes the complete tournament into the database in one transaction:
+    the general data into the table "tournaments", one row per player into
+    "players" and one row per game into "games". Rows of an earlier version
+    of the tournament are deleted first. Returns "OK" if no error occurred,
+    otherwise returns the error message.
+    """
+    filename = get_filename(tournament)
+    header = {key: value for key, value in tournament.items()
+              if key not in ("player_list", "rounds")}
+
+    try:
+        db = get_database()
+        with db:
+            db.execute("DELETE FROM tournaments WHERE filename = ?",
+                       (filename,))
+            db.execute("INSERT INTO tournaments VALUES (?, ?, ?, ?, ?, ?)",
+                       (filename, tournament["name"], tournament.get("venue"),
+                        tournament.get("last_round"), time.time(),
+                        json.dumps(header)))
+            db.executemany(
+                "INSERT INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(filename, number,
+                  *[player.get(column) for column in PLAYER_COLUMNS],
+                  json.dumps({key: value for key, value in player.items()
+                              if key not in PLAYER_COLUMNS}))
+                 for number, player in enumerate(tournament["player_list"],
+                                                 1)])
+            db.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?)",
+                [(filename, R, game, *pairing)
+                 for R, pairings in enumerate(tournament["rounds"], 1)
+                 for game, pairing in enumerate(pairings, 1)])
+    except Exception as e:
+        return e
+
+    return "OK"
+
+
+def read_sqlite_tournament(filename, rounds = None):
+    """Reads a tournament from the database and puts it together in the same
+    form as the json backend: general data, player list and a list of rounds
+    with [white, black, result] for every game, only the first "rounds"
+    rounds if rounds is given. Returns the dictionary if no error occurred,
+    otherwise returns the error message.
+    """
+    try:
+        db = get_database()
+        row = db.execute("SELECT header FROM tournaments WHERE filename = ?",
+                         (filename,)).fetchone()
+        if row is None:
+            return FileNotFoundError(f"Turnier {filename} nicht gefunden")
+        tournament = json.loads(row[0])
+
+        tournament["player_list"] = list()
+        for *columns, extra in db.execute(
+                "SELECT name, DWZ, evals, ELO, club, extra FROM players "
+                "WHERE filename = ? ORDER BY number", (filename,)):
+            player = {key: value for key, value in zip(PLAYER_COLUMNS, columns)
+                      if value is not None}
+            player.update(json.loads(extra))
+            tournament["player_list"].append(player)
+
+        tournament["rounds"] = list()
+        for R, white, black, result in db.execute(
+                "SELECT round, white, black, result FROM games "
+                "WHERE filename = ? AND round <= ? ORDER BY round, game",
+                (filename, rounds if rounds is not None else sys.maxsize)):
+            if R > len(tournament["rounds"]):
+                tournament["rounds"].append(list())
+            tournament["rounds"][R-1].append([white, black, result])
+    except Exception as e:
+        return e
+
+    return tournament
+
+
+def update_sqlite_game(tournament, R, game):
+    """Writes the result of a single game into its row of the table "games".
+    Rounds of a later cycle that have been added to the tournament data after
+    it was written (see get_round in tournament.py) are inserted first.
+    Returns "OK" if no error occurred, otherwise returns the error message.
+    """
+    filename = get_filename(tournament)
+
+    try:
+        db = get_database()
+        with db:
+            stored = db.execute("SELECT MAX(round) FROM games WHERE "
+                                "filename = ?", (filename,)).fetchone()[0]
+            db.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?)",
+                [(filename, r, g, *pairing)
+                 for r, pairings in enumerate(tournament["rounds"], 1)
+                 if r > (stored or 0)
+                 for g, pairing in enumerate(pairings, 1)])
+            db.execute("UPDATE games SET result = ? "
+                       "WHERE filename = ? AND round = ? AND game = ?",
+                       (tournament["rounds"][R-1][game-1][2], filename, R,
+                        game))
+            db.execute("UPDATE tournaments SET modified = ? "
+                       "WHERE filename = ?", (time.time(), filename))
+    except Exception as e:
+        return e
+
+    return "OK"
+
+
+def list_sqlite_tournaments():
+    """Returns a dictionary with the file names of all tournaments in the
+    database and the times of their last change.
+    """
+    try:
+        return dict(get_database().execute(
+            "SELECT filename, modified FROM tournaments"))
+    except Exception:
+        return dict()
+
+
+STORAGE_BACKENDS = {
+        "json": {"write": write_json_tournament,
+                 "read": read_json_tournament,
+                 "update": update_json_game,
+                 "list": list_json_tournaments},
+        "sqlite": {"write": write_sqlite_tournament,
+                   "read": read_sqlite_tournament,
+                   "update": update_sqlite_game,
+                   "list": list_sqlite_tournaments}
+        }
+
+# An unknown backend in CARL_FRIEDRICH_STORAGE would only fail at the first
+# read or write, so it is checked here and replaced by the default
+if set_storage_backend(storage_backend) != "OK":
+    print(f"WARNING: Unbekannte Datenablage: {storage_backend}, die Turniere",
+          "werden als json-Dateien gespeichert.", file = sys.stderr)
+    storage_backend = "json"
+
+
+def migrate_json_to_sqlite():
+    """Copies all tournaments from the json files in the data folder into the
+    SQLite database. Tournaments that are already in the database are
+    replaced. Returns the number of copied tournaments, files that cannot be
+    read are reported and skipped.
+    """
+    count = 0
+
+    for filename in sorted(list_json_tournaments()):
+        tournament = read_json_tournament(filename)
+        if isinstance(tournament, Exception):
+            print(f"ERROR: {filename}: {tournament}")
+            continue
+        error = write_sqlite_tournament(tournament)
+        if error != "OK":
+            print(f"ERROR: {filename}: {error}")
+            continue
+        count += 1
+
+    return count
+
+
 def get_tournament_filename():
-    """Prints a list of all .json files in the data folder defined by DATA_PATH
-    and lets the user chose a file. The filename is the returned to the caller.
+    """Prints a list of all stored tournaments (.json files in the data folder
+    defined by DATA_PATH, or tournaments in the database) and lets the user
+    chose one. The filename is the returned to the caller.
     """
     print("\n\nLade Turnierdaten")
     print("=================\n")
 
-    files = [f for f in os.listdir(DATA_PATH) if f.endswith(".json")]
+    files = sorted(list_tournament_files())
     for i, f in enumerate(files, 1):
         print(f"{i:3d} -- {f.split('.')[0].replace('_', ' '):25s}")
 
@@ -94,6 +547,33 @@ def get_tournament_filename():
     return filename
 
 
+def write_pairing_table(number_players, table):
+    """Writes the Berger pairing table for number_players to its own json file
+    in the cache folder. Returns "OK" if no error occurred, otherwise returns
+    the error message.
+    """
+    try:
+        os.makedirs(CACHE_PATH, exist_ok=True)
+        with open(PAIRING_TABLE_FILE.format(number_players), "w") as fout:
+            fout.write(json.dumps(table))
+    except Exception as e:
+        return e
+
+    return "OK"
+
+
+def read_pairing_table(number_players):
+    """Reads the cached Berger pairing table for number_players from the cache
+    folder. Returns None if there is no cache file for number_players yet or
+    if it cannot be read.
+    """
+    try:
+        with open(PAIRING_TABLE_FILE.format(number_players), "r") as fin:
+            return json.loads(fin.read())
+    except Exception:
+        return None
+
+
 def switch_stdout(filename = ""):
     """Switch standard output stream to given filename or switch back to
     __stdout__, the output stream that was active when the program was started,
@@ -117,9 +597,12 @@ def switch_stdout(filename = ""):
 
 
 def main():
-    """Just a placeholder, does nothing.
+    """Copies all json files into the SQLite database if the script is called
+    with the argument "migrate", otherwise does nothing.
     """
-    pass
+    if sys.argv[1:] == ["migrate"]:
+        count = migrate_json_to_sqlite()
+        print(f"{count} Turniere in die Datenbank {DATABASE_FILE} übernommen.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+==============
+liveresults.py
+==============
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Reads game results from a file that is growing during the round (e.g. the
+export of electronic boards or a results app) or from a named pipe (created
+with "mkfifo", the other program writes into it), and enters them into the
+tournament data while the round is being played. The standard input cannot be
+used, because the menu reads its input from there and has already buffered
+the lines that follow.
+
+Every line of the results feed contains one result in the form
+"<round> <game> <result>", e.g. "3 2 =" for a draw in game 2 of round 3. Round
+and game may also be separated by a dot, comma or semicolon ("3.2 ="). The
+result uses the same characters as the manual input (1, 0, =, +, -, C). Lines
+that do not match this format are ignored.
+
+Results that arrive in quick succession are collected: the tournament data is
+saved and the standings are printed only once DEBOUNCE_TIME seconds after the
+last result of a burst has arrived.
+
+Functions in liveresults.py:
+============================
+parse_result_line(line)
+    Converts a line of the results feed into (round, game, result), or None.
+
+read_feed(fd, buffer, timeout)
+    Reads the lines that have been added to the results feed since the last
+    call.
+
+follow_results(tournament, source)
+    Follows a results file or named pipe until the user stops it with Ctrl+C
+    or the pipe is closed, and enters all results into the tournament data.
+
+show_changes(tournament, changed_games)
+    Saves the changed games and prints the changed rounds and the standings.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+import os
+import re
+import select
+import stat
+import time
+
+from datastorage import update_game_data
+from tournament import RESULT2POINTS, number_rounds, set_result, \
+                       refresh_scores, print_pairings, print_ranking
+
+
+RESULT_LINE = re.compile(r"^\s*(\d+)\s*[\s.,;]\s*(\d+)"
+                         r"\s*[\s,;:]\s*([10=+\-C])")
+
+# Waiting time in seconds after the last result before data is saved and shown
+DEBOUNCE_TIME = 2.0
+# Waiting time in seconds between two checks of a results file for new lines
+POLL_INTERVAL = 0.5
+
+
+def parse_result_line(line):
+    """Converts a line of the results feed into a tuple (round, game, result)
+    with round and game as int values. Returns None if the line does not
+    contain a result.
+    """
+    match = RESULT_LINE.match(line)
+    if not match:
+        return None
+
+    return int(match.group(1)), int(match.group(2)), match.group(3)
+
+
+def read_feed(fd, buffer, timeout):
+    """Reads everything that has been added to the results feed with the file
+    descriptor fd since the last call and returns a tuple (lines, closed).
+    Incomplete lines are kept in the bytearray "buffer" until the rest of the
+    line has arrived. A pipe is waited for at most "timeout" seconds, closed
+    is True when the writing end of the pipe has been closed. The end of a
+    regular file only means that no new results have been written yet.
+    """
+    is_file = stat.S_ISREG(os.fstat(fd).st_mode)
+
+    if not is_file:
+        ready, _, _ = select.select([fd], [], [], timeout)
+        if not ready:
+            return list(), False
+
+    data = os.read(fd, 65536)
+    if not data:
+        if is_file:
+            time.sleep(timeout)
+        return list(), not is_file
+
+    buffer.extend(data)
+    *lines, rest = buffer.split(b"\n")
+    buffer[:] = rest
+
+    return [line.decode("utf-8", errors = "replace") for line in lines], False
+
+
+def follow_results(tournament, source):
+    """Follows the results feed "source" (a file or a named pipe) and enters
+    every new result into the tournament data. The scores of all rounds are
+    calculated once at the beginning and then only changed by the difference
+    between the old and the new result of a game.
+
+    After a burst of results, the changed games are saved once, and the
+    pairings of the rounds concerned and the standings are printed once. The
+    function returns the tournament data when the user presses Ctrl+C or the
+    pipe is closed, otherwise the error message if the feed cannot be opened.
+    Opening a named pipe waits until the other program has opened it for
+    writing, which can also be stopped with Ctrl+C.
+    """
+    print("\nWarte auf Ergebnisse, Abbruch mit Strg+C ...")
+
+    try:
+        fd = os.open(source, os.O_RDONLY)
+    except KeyboardInterrupt:
+        return tournament
+    except Exception as e:
+        return e
+
+    tournament = refresh_scores(tournament, number_rounds(tournament))
+    scores = tournament["standings"]
+    buffer = bytearray()
+    changed_games = set()
+    last_change = 0
+
+    try:
+        closed = False
+        while not closed:
+            lines, closed = read_feed(fd, buffer, POLL_INTERVAL)
+
+            for line in lines:
+                entry = parse_result_line(line)
+                if not entry:
+                    continue
+                R, game, result = entry
+                if not (0 < R <= number_rounds(tournament)
+                        and 0 < game <= len(tournament["player_list"]) // 2):
+                    continue
+
+                old_result = set_result(tournament, R, game, result)
+                if old_result == result:
+                    continue
+                white, black, _ = tournament["rounds"][R-1][game-1]
+                scores[white-1] += RESULT2POINTS[result][0] \
+                    - RESULT2POINTS[old_result][0]
+                scores[black-1] += RESULT2POINTS[result][1] \
+                    - RESULT2POINTS[old_result][1]
+                changed_games.add((R, game))
+                last_change = time.monotonic()
+
+            if changed_games and (closed or
+                    time.monotonic() - last_change >= DEBOUNCE_TIME):
+                show_changes(tournament, changed_games)
+                changed_games = set()
+    except KeyboardInterrupt:
+        if changed_games:
+            show_changes(tournament, changed_games)
+    finally:
+        os.close(fd)
+
+    return tournament
+
+
+def show_changes(tournament, changed_games):
+    """Saves every game in "changed_games", a set of tuples (round, game), in
+    the same way as update_result, then prints the pairings of the rounds
+    concerned and the current standings. Always returns None.
+    """
+    for R, game in sorted(changed_games):
+        error = update_game_data(tournament, R, game)
+        if error != "OK":
+            print(f"\n\nERROR: {error}\n\n")
+            break
+
+    for R in sorted({R for R, _ in changed_games}):
+        tmp_str = f"Aktualisierte Resultate in Runde {R}:"
+        print("\n" + tmp_str)
+        print("-" * len(tmp_str))
+        print_pairings(tournament, R)
+
+    print_ranking(tournament, "Aktueller Stand:")
+
+    return None
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+=============
+ratingsync.py
+=============
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Updates the ratings (DWZ, number of evaluations, ELO) of all players in all
+stored tournaments from the rating database of the German Chess Association.
+The ratings in the player lists are those from the day on which the players
+were entered, so they have to be updated before rating reports are made.
+
+Every player is looked up only once, however many tournaments the player has
+played. The search pages are downloaded in parallel threads (the time is spent
+waiting for the server, not in Python). The ETag and Last-Modified headers and
+the players of every search page are kept in the cache folder, so that the
+next update asks the server only whether a page has changed (conditional
+request) and an unchanged page is not downloaded and parsed again.
+
+A player is identified by name and club. If the club has changed, a player
+with the same name is only accepted if there is no other hit with that name.
+Players who were entered manually and cannot be found keep their data. Only
+tournaments in which a rating has changed are written again.
+
+Functions in ratingsync.py:
+===========================
+load_rating_cache()
+    Returns the cached search pages from the cache folder.
+
+save_rating_cache(cache)
+    Writes the cached search pages to the cache folder.
+
+fetch_players(name, cached)
+    Looks up a name in the DSB database with a conditional request.
+
+find_player(player, hits)
+    Returns the hit that belongs to a stored player, or None.
+
+update_ratings(player, hit)
+    Copies the ratings of the hit into the player dictionary.
+
+sync_ratings()
+    Updates the ratings in all stored tournaments and returns the number of
+    players looked up and the changed tournaments.
+
+main()
+    Updates the ratings of all stored tournaments from the command line.
+"""
+
+
+import json
+import os
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from datastorage import CACHE_PATH, list_tournament_files, \
+                        read_tournament_data, write_tournament_data
+from playerindex import get_players
+from rendercache import clear_render_cache
+from webscraper import get_search_url, read_player_table
+
+
+RATING_CACHE_FILE = CACHE_PATH + "ratings.json"
+# Number of search pages that are downloaded at the same time
+MAX_DOWNLOADS = 8
+# Entries of the player dictionary that are updated
+RATING_KEYS = ("DWZ", "evals", "ELO")
+
+
+def load_rating_cache():
+    """Returns a dictionary with the search URL as key and a dictionary with
+    the entries 'etag', 'modified' and 'players' as value. Returns an empty
+    dictionary if there is no cache file yet or it cannot be read.
+    """
+    try:
+        with open(RATING_CACHE_FILE, "r") as fin:
+            return json.loads(fin.read())
+    except Exception:
+        return dict()
+
+
+def save_rating_cache(cache):
+    """Writes the cached search pages to the cache folder. The cache is
+    optional, so an error only means that all pages are downloaded next time.
+    Returns "OK" or the error message.
+    """
+    try:
+        os.makedirs(CACHE_PATH, exist_ok=True)
+        with open(RATING_CACHE_FILE, "w") as fout:
+            fout.write(json.dumps(cache))
+    except Exception as e:
+        return e
+
+    return "OK"
+
+
+def fetch_players(name, cached):
+    """Looks up "name" in the DSB database. If the search page is in the
+    cache, the request contains its ETag and Last-Modified date, and the
+    server answers with status 304 if nothing has changed. Returns a tuple
+    (url, cache entry, downloaded), where the cache entry contains the list of
+    players found, or (url, None, False) if the page could not be loaded.
+
+    Runs in a worker thread, so it must not change any shared data.
+    """
+    url = get_search_url(name)
+    entry = cached.get(url)
+    headers = dict()
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("modified"):
+        headers["If-Modified-Since"] = entry["modified"]
+
+    try:
+        request = urllib.request.Request(url, headers = headers)
+        with urllib.request.urlopen(request) as response:
+            players = read_player_table(response)
+            return url, {"etag": response.headers.get("ETag"),
+                         "modified": response.headers.get("Last-Modified"),
+                         "players": players}, True
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and entry:
+            return url, entry, False
+    except Exception:
+        pass
+
+    return url, None, False
+
+
+def find_player(player, hits):
+    """Returns the hit from the DSB search that belongs to the stored player:
+    the hit with the same name and club, otherwise the only hit with the
+    same name. Returns None if the player cannot be identified.
+    """
+    same_name = [hit for hit in hits if hit.get("name") == player["name"]]
+
+    for hit in same_name:
+        if hit.get("club") == player.get("club"):
+            return hit
+    if len(same_name) == 1:
+        return same_name[0]
+
+    return None
+
+
+def update_ratings(player, hit):
+    """Copies DWZ, number of evaluations and ELO from the hit into the player
+    dictionary. Ratings that the hit does not have are left as they are.
+    Returns True if a rating has changed.
+    """
+    changed = False
+
+    for key in RATING_KEYS:
+        if key in hit and player.get(key) != hit[key]:
+            player[key] = hit[key]
+            changed = True
+
+    return changed
+
+
+def sync_ratings():
+    """Reads all stored tournaments, collects the names of all players and
+    looks up every name once, MAX_DOWNLOADS names at a time. Then the ratings
+    of all players are updated and every tournament with a changed rating is
+    written again and removed from the render cache.
+
+    Returns a tuple (number of names, number of downloaded pages, list of
+    changed tournament names, list of errors).
+    """
+    tournaments = list()
+    errors = list()
+    for filename in sorted(list_tournament_files()):
+        tournament = read_tournament_data(filename)
+        if isinstance(tournament, Exception):
+            errors.append(f"{filename}: {tournament}")
+        else:
+            tournaments.append(tournament)
+
+    names = sorted({player["name"] for tournament in tournaments
+                    for player in get_players(tournament)})
+
+    cache = load_rating_cache()
+    hits = dict()
+    downloads = 0
+    with ThreadPoolExecutor(max_workers = MAX_DOWNLOADS) as executor:
+        results = executor.map(lambda name: fetch_players(name, cache), names)
+        for name, (url, entry, downloaded) in zip(names, results):
+            if entry is None:
+                errors.append(f"{name}: Suche fehlgeschlagen")
+                continue
+            cache[url] = entry
+            hits[name] = entry["players"]
+            downloads += downloaded
+    save_rating_cache(cache)
+
+    changed = list()
+    for tournament in tournaments:
+        updated = False
+        for player in get_players(tournament):
+            hit = find_player(player, hits.get(player["name"], list()))
+            if hit and update_ratings(player, hit):
+                updated = True
+        if updated:
+            error = write_tournament_data(tournament)
+            if error != "OK":
+                errors.append(f"{tournament['name']}: {error}")
+                continue
+            clear_render_cache(tournament)
+            changed.append(tournament["name"])
+
+    return len(names), downloads, changed, errors
+
+
+def main():
+    """Updates the ratings of all stored tournaments and prints a summary.
+    """
+    print("\nAktualisiere Wertungszahlen aller gespeicherten Turniere ...")
+    names, downloads, changed, errors = sync_ratings()
+
+    print(f"{names} Spieler gesucht, {downloads} Seiten neu geladen,",
+          f"{len(changed)} Turniere geändert.")
+    for name in changed:
+        print(f"    {name}")
+    for error in errors:
+        print(f"ERROR: {error}")
+
+
+if __name__ == "__main__":
+    main()
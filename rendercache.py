@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+==============
+rendercache.py
+==============
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Keeps the formatted text of pairings and standings, so that the same output is
+not formatted again every time the menu shows it or a round is exported.
+
+Data structure:
+===============
+    Every text is stored under the key (tournament name, output kind, round,
+    version). The version of a round is a number that is increased whenever a
+    result of that round changes. Pairings of round R use the version of
+    round R, standings after round R the highest version of the rounds 1...R.
+    A changed result therefore only affects the pairings of its own round and
+    the standings after that round and all later rounds. Outdated texts are
+    never looked up again and are dropped from the cache once it is full,
+    least recently used first.
+
+Functions in rendercache.py:
+============================
+get_version(tournament, R, kind)
+    Returns the version that is valid for output of the given kind for round R.
+
+invalidate_round(tournament, R)
+    Marks the pairings of round R and the standings from round R on as
+    outdated.
+
+clear_render_cache(tournament)
+    Marks all output of a tournament as outdated, e.g. after loading it anew.
+
+get_rendered(tournament, R, kind)
+    Returns the cached text, or None if there is no valid text in the cache.
+
+store_rendered(tournament, R, kind, text)
+    Stores a text in the cache and removes the least recently used text if the
+    cache is full.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+from collections import OrderedDict
+
+
+# Maximum number of texts kept in the cache
+RENDER_CACHE_SIZE = 128
+
+# Output kinds that depend on all rounds up to R instead of round R only
+CUMULATIVE_KINDS = ("standings", "team_standings")
+
+# Formatted texts, the most recently used at the end
+render_cache = OrderedDict()
+# Version counter and versions of all changed rounds, per tournament name
+version_counter = 0
+round_versions = dict()
+
+
+def get_version(tournament, R, kind):
+    """Returns the version of round R for pairings, or the highest version of
+    the rounds 1...R for standings. The version 0 of round 0 is valid for
+    all rounds that have not been changed since the tournament was loaded.
+    """
+    versions = round_versions.setdefault(tournament["name"], {0: 0})
+
+    if kind in CUMULATIVE_KINDS:
+        return max(version for r, version in versions.items() if r <= R)
+
+    return versions.get(R, versions[0])
+
+
+def invalidate_round(tournament, R):
+    """Gives round R a new version after a result of that round has changed.
+    Always returns None.
+    """
+    global version_counter
+
+    version_counter += 1
+    round_versions.setdefault(tournament["name"], {0: 0})[R] = version_counter
+
+    return None
+
+
+def clear_render_cache(tournament):
+    """Gives the whole tournament a new version (stored as round 0, which all
+    output depends on), e.g. after it has been loaded from a file or its
+    player data has changed. Always returns None.
+    """
+    global version_counter
+
+    version_counter += 1
+    round_versions[tournament["name"]] = {0: version_counter}
+
+    return None
+
+
+def get_rendered(tournament, R, kind):
+    """Returns the cached text of output "kind" ("pairings", "standings", ...)
+    for round R, or None if there is no text for the current version.
+    """
+    key = (tournament["name"], kind, R, get_version(tournament, R, kind))
+    text = render_cache.get(key)
+    if text is not None:
+        render_cache.move_to_end(key)
+
+    return text
+
+
+def store_rendered(tournament, R, kind, text):
+    """Stores the text of output "kind" for round R under the current version
+    and drops the least recently used text if the cache is full. Returns the
+    text, so that the caller can print it directly.
+    """
+    key = (tournament["name"], kind, R, get_version(tournament, R, kind))
+    render_cache[key] = text
+    render_cache.move_to_end(key)
+    if len(render_cache) > RENDER_CACHE_SIZE:
+        render_cache.popitem(last = False)
+
+    return text
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+================
+scheduleindex.py
+================
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Answers the questions "When do I play against B, and with which colour?" and
+"Who are my opponents in the next rounds?" without searching through all
+rounds of the tournament for every question.
+
+Data structure:
+===============
+    The schedule index is a dictionary with two entries, built in one pass
+    over all rounds of all cycles (including the cycles that have not been
+    added to the tournament data yet):
+    'player': a list with one list per player (0-based index in the player
+              list), which contains a tuple (opponent, colour, board) for
+              every round, opponent being the 0-based index of the opponent,
+              colour "W" or "S" and board the 1-based number of the game.
+    'pair':   a dictionary with the tuple (a, b), a < b, of 0-based player
+              indices as key and the list of rounds in which a and b meet.
+    The results are not part of the index, they are looked up with round and
+    board in the tournament data, so the index does not change when a result
+    is entered. The pairings never change after the tournament has been
+    created, so the index is built once per loaded tournament.
+
+Functions in scheduleindex.py:
+==============================
+build_schedule_index(tournament)
+    Builds the schedule index from all rounds of the tournament.
+
+get_schedule_index(tournament)
+    Returns the schedule index of the tournament, building it on first use.
+
+get_meetings(tournament, a, b)
+    Returns round, colour of player a and board of all games of a against b.
+
+format_player_schedule(tournament, player)
+    Returns the schedule of one player with opponents, colours and results as
+    text.
+
+print_player_schedule(tournament, player)
+    Prints the schedule of one player.
+
+write_schedules_to_file(tournament)
+    Writes the schedules of all players into one text file.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+from datastorage import switch_stdout
+from tournament import EXPAND_RESULT, generate_rounds, get_first_cycle
+
+
+# Schedule index and the rounds it was built from, per tournament name
+schedule_indexes = dict()
+
+
+def build_schedule_index(tournament):
+    """Builds the schedule index described above from the rounds stored in the
+    tournament data and the rounds of the later cycles, which are generated
+    without adding them to the tournament data. Returns the index.
+    """
+    number_players = len(tournament["player_list"])
+    index = {"player": [list() for _ in range(number_players)],
+             "pair": dict()}
+
+    later_rounds = generate_rounds(number_players,
+                                   tournament.get("cycles", 1),
+                                   len(tournament["rounds"]) + 1,
+                                   table = get_first_cycle(tournament))
+
+    for R, pairings in enumerate((*tournament["rounds"], *later_rounds), 1):
+        for board, (white, black, _) in enumerate(pairings, 1):
+            white, black = white - 1, black - 1
+            index["player"][white].append((black, "W", board))
+            index["player"][black].append((white, "S", board))
+            pair = (min(white, black), max(white, black))
+            index["pair"].setdefault(pair, list()).append(R)
+
+    return index
+
+
+def get_schedule_index(tournament):
+    """Returns the schedule index of the tournament. It is built when it is
+    needed for the first time and kept as long as the tournament data in
+    memory is the same, i.e. until the tournament is loaded or created anew.
+    """
+    rounds, index = schedule_indexes.get(tournament["name"], (None, None))
+
+    if rounds is not tournament["rounds"]:
+        index = build_schedule_index(tournament)
+        schedule_indexes[tournament["name"]] = (tournament["rounds"], index)
+
+    return index
+
+
+def get_meetings(tournament, a, b):
+    """Returns a list of tuples (round, colour of a, board) for all games of
+    player a against player b (0-based indices), one per cycle.
+    """
+    index = get_schedule_index(tournament)
+    rounds = index["pair"].get((min(a, b), max(a, b)), list())
+
+    return [(R, *index["player"][a][R-1][1:]) for R in rounds]
+
+
+def format_player_schedule(tournament, player):
+    """Returns the schedule of player (0-based index) as text: one line per
+    round with board, colour, opponent and the result from the point of view
+    of the player, if the game has already been played.
+    """
+    player_list = tournament["player_list"]
+    rounds = tournament["rounds"]
+
+    tmp_str = f"Spielplan {player_list[player]['name']}"
+    lines = ["\n" + tmp_str + "\n", "=" * len(tmp_str) + "\n"]
+
+    for R, (opponent, colour, board) in enumerate(
+            get_schedule_index(tournament)["player"][player], 1):
+        name = player_list[opponent]["name"]
+        result = ""
+        if R <= len(rounds) and rounds[R-1][board-1][2] != "_":
+            result = EXPAND_RESULT[rounds[R-1][board-1][2]]
+            if colour == "S":
+                # Results are stored from the point of view of white
+                result = " - ".join(reversed(result.split(" - ")))
+        if name == "spielfrei":
+            lines.append(f"Runde {R:2d}:  spielfrei\n")
+        else:
+            lines.append(f"Runde {R:2d}:  Brett {board:2d}  {colour}  "
+                         f"{name[:25]:25s}  {result}".rstrip() + "\n")
+
+    return "".join(lines)
+
+
+def print_player_schedule(tournament, player):
+    """Prints the schedule of player (0-based index). Always returns None.
+    """
+    print(format_player_schedule(tournament, player), end="")
+
+    return None
+
+
+def write_schedules_to_file(tournament):
+    """Writes the schedules of all real players into one text file named
+    after the tournament. The index is built once for all players. Returns
+    "OK" or the error message.
+    """
+    filename = tournament["name"].replace(" ", "_") + "_Spielplaene.txt"
+
+    error = switch_stdout(filename)
+    if error != "OK":
+        return error
+
+    tmp_str = "CARL-FRIEDRICH V1.0"
+    print("=" * (len(tmp_str) + 8))
+    print("=== " + tmp_str + " ===")
+    print("=" * (len(tmp_str) + 8))
+
+    for player, player_data in enumerate(tournament["player_list"]):
+        if player_data["name"] != "spielfrei":
+            print_player_schedule(tournament, player)
+
+    return switch_stdout()
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
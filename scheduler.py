@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+============
+scheduler.py
+============
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Rearranges the Berger table of a tournament to meet practical wishes that the
+plain table ignores:
+    - Players of the same club should play each other in the first rounds
+      (before they can arrange results that influence the standings).
+    - Players who cannot play in a certain round should get the bye in that
+      round, or at least as few games as possible in their absent rounds.
+    - Nobody should get the same colour in several consecutive rounds.
+
+Any assignment of the pairing numbers of the table to the players and any
+order of the rounds of the table is again a valid round-robin schedule with
+balanced colours, so the search only ever changes these two permutations and
+the result remains equivalent to the Berger table.
+
+Data structure:
+===============
+    'seats' is a list with the 0-based pairing number of every player (index
+    in the player list), 'order' a list with the 0-based table round played
+    in every round of the tournament. 'unavailable' is a dictionary with the
+    0-based player index as key and a set of 0-based round positions within a
+    cycle as value. Later cycles repeat the first cycle with reversed colours,
+    so an absence in round R of any cycle counts for the same position.
+
+Costs:
+======
+    Every same-club pair costs the 0-based round in which it meets times
+    CLUB_WEIGHT, every game in an absent round UNAVAILABLE_WEIGHT, every
+    colour repeated in two consecutive rounds COLOUR_WEIGHT and every third
+    game with the same colour in a row additionally STREAK_WEIGHT. Colours of
+    the bye are not counted.
+
+    The search is a hill climbing over two kinds of moves: swapping the
+    pairing numbers of two players and swapping two rounds. A move only
+    recalculates the costs it can change: a swap of two players only the club
+    pairs of these two players and the absences, a swap of two rounds only
+    the colours in the neighbourhood of both rounds.
+
+Functions in scheduler.py:
+==========================
+get_table_data(table)
+    Returns round of every meeting, colours and opponents of all pairing
+    numbers of a Berger table.
+
+get_club_pairs(player_list)
+    Returns all pairs of real players from the same club.
+
+club_cost(data, seats, position, pairs)
+    Returns the cost of the rounds in which the club pairs meet.
+
+unavailable_cost(data, seats, order, unavailable, bye)
+    Returns the number of games in rounds in which a player is absent.
+
+colour_cost(data, order, numbers, positions)
+    Returns the cost of repeated colours for some pairing numbers, counted at
+    some round positions.
+
+optimise_schedule(table, player_list, unavailable, time_limit)
+    Searches for a better assignment of pairing numbers and order of rounds
+    and returns the rearranged table, or the table itself if there is no
+    improvement.
+
+get_unavailable_rounds(player_list, number_rounds)
+    Lets the user enter the rounds in which every player cannot play.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+import random
+import time
+
+
+# Weights of the costs described above
+CLUB_WEIGHT = 2
+UNAVAILABLE_WEIGHT = 100
+COLOUR_WEIGHT = 1
+STREAK_WEIGHT = 10
+
+# Maximum time in seconds for the search, and number of moves without
+# improvement after which the search gives up earlier
+OPTIMISE_TIME = 3.0
+MAX_FAILED_MOVES = 50000
+
+
+def get_table_data(table):
+    """Returns a dictionary with three lists for a Berger table (list of rounds
+    with [white, black] pairs of 1-based pairing numbers): 'meet' with the
+    0-based table round of every pair of 0-based pairing numbers, 'colour'
+    with 1 (white) or -1 (black) and 'opponent' with the opponent of every
+    pairing number in every table round.
+    """
+    n = len(table) + 1
+    meet = [[None] * n for _ in range(n)]
+    colour = [[0] * len(table) for _ in range(n)]
+    opponent = [[0] * len(table) for _ in range(n)]
+
+    for t, pairings in enumerate(table):
+        for white, black in pairings:
+            white, black = white - 1, black - 1
+            meet[white][black] = meet[black][white] = t
+            colour[white][t], colour[black][t] = 1, -1
+            opponent[white][t], opponent[black][t] = black, white
+
+    return {"meet": meet, "colour": colour, "opponent": opponent}
+
+
+def get_club_pairs(player_list):
+    """Returns a list with all pairs (i, j) of 0-based indices of players who
+    have entered the same club. Players without a club and the bye are left
+    out.
+    """
+    clubs = dict()
+    for i, player in enumerate(player_list):
+        club = player.get("club", "").strip()
+        if club and player["name"] != "spielfrei":
+            clubs.setdefault(club, list()).append(i)
+
+    return [(i, j) for members in clubs.values()
+            for a, i in enumerate(members) for j in members[a+1:]]
+
+
+def club_cost(data, seats, position, pairs):
+    """Returns the sum of the 0-based rounds in which the club "pairs" meet,
+    times CLUB_WEIGHT. position is the inverse of 'order', i.e. the round in
+    which every table round is played.
+    """
+    meet = data["meet"]
+
+    return CLUB_WEIGHT * sum(position[meet[seats[i]][seats[j]]]
+                             for i, j in pairs)
+
+
+def unavailable_cost(data, seats, order, unavailable, bye):
+    """Returns the number of games that players have to play in rounds in
+    which they are absent, times UNAVAILABLE_WEIGHT. A game against the bye
+    (0-based player index bye, or None) is no game.
+    """
+    opponent = data["opponent"]
+    bye_number = seats[bye] if bye is not None else None
+    games = 0
+
+    for i, rounds in unavailable.items():
+        for k in rounds:
+            if opponent[seats[i]][order[k]] != bye_number:
+                games += 1
+
+    return UNAVAILABLE_WEIGHT * games
+
+
+def colour_cost(data, order, numbers, positions):
+    """Returns the cost of repeated colours for all 0-based pairing numbers in
+    "numbers". The cost is counted at the rounds in "positions" only: a round
+    costs COLOUR_WEIGHT if the colour is the same as in the round before and
+    additionally STREAK_WEIGHT if it is the same as in the two rounds before.
+    """
+    cost = 0
+
+    for p in numbers:
+        colour = data["colour"][p]
+        for k in positions:
+            if k >= 1 and colour[order[k]] == colour[order[k-1]]:
+                cost += COLOUR_WEIGHT
+                if k >= 2 and colour[order[k-2]] == colour[order[k]]:
+                    cost += STREAK_WEIGHT
+
+    return cost
+
+
+def optimise_schedule(table, player_list, unavailable,
+                      time_limit = OPTIMISE_TIME):
+    """Searches for an assignment of the pairing numbers of the Berger table
+    "table" to the players of "player_list" and an order of its rounds with
+    lower costs than the table itself. Starts with the table as it is and
+    tries random swaps of two players or two rounds, keeping every swap that
+    does not increase the costs, until time_limit seconds have passed or
+    MAX_FAILED_MOVES swaps have not improved the best costs.
+
+    Returns a tuple (schedule, costs, costs of the plain table), where
+    schedule is a list of rounds with [white, black] pairs of 1-based player
+    indices. If no better schedule is found, the table itself is returned.
+    """
+    n = len(player_list)
+    rounds = len(table)
+    data = get_table_data(table)
+    pairs = get_club_pairs(player_list)
+    byes = [i for i, player in enumerate(player_list)
+            if player["name"] == "spielfrei"]
+    bye = byes[0] if byes else None
+
+    # Club pairs of every player, so that a swap of two players only
+    # recalculates their own pairs
+    player_pairs = [[pair for pair in pairs if i in pair] for i in range(n)]
+
+    seats = list(range(n))
+    order = list(range(rounds))
+    position = list(range(rounds))
+
+    def numbers():
+        return [p for p in range(n) if bye is None or p != seats[bye]]
+
+    costs = club_cost(data, seats, position, pairs) \
+        + unavailable_cost(data, seats, order, unavailable, bye) \
+        + colour_cost(data, order, numbers(), range(rounds))
+    standard_costs = best_costs = costs
+    best = None
+
+    deadline = time.monotonic() + time_limit
+    failed = 0
+
+    while failed < MAX_FAILED_MOVES and costs > 0:
+        # Checking the time is slow compared to a move
+        if failed % 256 == 0 and time.monotonic() > deadline:
+            break
+
+        if random.random() < 0.5:
+            a, b = random.sample(range(n), 2)
+            changed = set(player_pairs[a]) | set(player_pairs[b])
+            old = club_cost(data, seats, position, changed) \
+                + unavailable_cost(data, seats, order, unavailable, bye)
+            if bye in (a, b):
+                old += colour_cost(data, order, numbers(), range(rounds))
+            seats[a], seats[b] = seats[b], seats[a]
+            new = club_cost(data, seats, position, changed) \
+                + unavailable_cost(data, seats, order, unavailable, bye)
+            if bye in (a, b):
+                new += colour_cost(data, order, numbers(), range(rounds))
+            if new > old:
+                seats[a], seats[b] = seats[b], seats[a]
+        else:
+            k1, k2 = random.sample(range(rounds), 2)
+            windows = {k + d for k in (k1, k2) for d in range(3)
+                       if k + d < rounds}
+            old = club_cost(data, seats, position, pairs) \
+                + unavailable_cost(data, seats, order, unavailable, bye) \
+                + colour_cost(data, order, numbers(), windows)
+            order[k1], order[k2] = order[k2], order[k1]
+            position[order[k1]], position[order[k2]] = k1, k2
+            new = club_cost(data, seats, position, pairs) \
+                + unavailable_cost(data, seats, order, unavailable, bye) \
+                + colour_cost(data, order, numbers(), windows)
+            if new > old:
+                order[k1], order[k2] = order[k2], order[k1]
+                position[order[k1]], position[order[k2]] = k1, k2
+
+        if new <= old:
+            costs += new - old
+        if costs < best_costs:
+            best_costs = costs
+            best = (list(seats), list(order))
+            failed = 0
+        else:
+            failed += 1
+
+    if best is None:
+        return table, standard_costs, standard_costs
+
+    seats, order = best
+    players = [0] * n
+    for i, p in enumerate(seats):
+        players[p] = i + 1
+    schedule = [[[players[white-1], players[black-1]]
+                 for white, black in table[t]] for t in order]
+
+    return schedule, best_costs, standard_costs
+
+
+def get_unavailable_rounds(player_list, number_rounds):
+    """Lets the user enter the rounds in which every real player cannot play,
+    separated by commas or blanks. Returns the dictionary 'unavailable' with
+    0-based player indices and positions within the first cycle (see above).
+    """
+    rounds_per_cycle = len(player_list) - 1
+    unavailable = dict()
+
+    print("\nIn welchen Runden können die Spieler nicht spielen?",
+          "(z.B. 3,5; ENTER: keine)")
+
+    for i, player in enumerate(player_list):
+        if player["name"] == "spielfrei":
+            continue
+        while True:
+            tmp = input(f"{player['name'][:25]:25s} > ")
+            rounds = tmp.replace(",", " ").split()
+            if all(R.isnumeric() and 0 < int(R) <= number_rounds
+                   for R in rounds):
+                break
+        if rounds:
+            unavailable[i] = {(int(R) - 1) % rounds_per_cycle for R in rounds}
+
+    return unavailable
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
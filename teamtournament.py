@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+=================
+teamtournament.py
+=================
+
+Author : Dr. Andreas Janzen
+Email  : janzen (at) gmx.net
+Date   : 2021-04-07
+Version: 1.0
+
+Data structure:
+===============
+    Team tournaments use the same dictionary 'tournament' as individual
+    tournaments, with the entries 'type' set to "team", 'teams' (number of
+    teams) and 'boards' (number of boards per team). The entry 'player_list'
+    contains the teams instead of the players, each team being a dictionary
+    with 'name' and 'players' (list of player dictionaries in board order).
+    A bye ("spielfrei") is added if the number of teams is odd, so the Berger
+    pairings of the teams are created exactly like the pairings of individual
+    players.
+
+    Every pairing in 'rounds' consists of the indices of the two teams and a
+    string with one result character per board, e.g. "1=0_" for four boards.
+    The characters have the same meaning as for individual games (see
+    RESULT2POINTS). The first team plays with the white pieces on the odd
+    boards (1, 3, ...), the second team on the even boards.
+
+Implements functions to organize a round-robin team tournament:
+    - Create the tournament with teams and their players
+    - Print the pairings of a round with the games on each board
+    - Enter the result of a single board
+    - Calculate match points, board points and the Berlin tie-break
+
+Functions in teamtournament.py:
+===============================
+create_new_team_tournament()
+    Asks the user for the key data, the teams and their players, creates the
+    pairings of the teams and stores the data in a json file.
+
+create_team_list(number_teams, boards)
+    Lets the user enter the names of all teams and their players.
+
+get_board_players(tournament, pairing, board)
+    Returns the player dictionaries of white and black on a board (0-based).
+
+match_score(results)
+    Returns board points, Berlin tie-break and the number of open boards of
+    both teams for the result string of a match. Memoized.
+
+team_scores(tournament, R)
+    Returns match points, board points and Berlin tie-break of all teams after
+    round R.
+
+print_team_pairings(tournament, R)
+    Prints the matches of round R with the games on every board.
+
+update_board_result(tournament, R, match, board, result)
+    Updates the result of one board of a match and saves the tournament.
+
+print_team_standings(tournament, R)
+    Prints the teams sorted by match points, board points and Berlin
+    tie-break after round R.
+
+write_team_pairings_to_file(tournament, R)
+    Exports the standings after round R-1 and the pairings of round R into a
+    text file.
+
+main()
+    Just a placeholder, does nothing.
+"""
+
+
+from functools import lru_cache
+
+from datastorage import write_tournament_data, update_game_data, \
+                        switch_stdout
+from rendercache import get_rendered, store_rendered, invalidate_round, \
+                        clear_render_cache
+from tournament import EXPAND_RESULT, RESULT2POINTS, create_pairing_list, \
+                       get_round
+
+
+# Points for a won, drawn and lost match
+MATCH_POINTS = (2, 1, 0)
+
+
+def create_new_team_tournament():
+    """Ask user for details of a newly created team tournament: name, number of
+    teams and boards, cycles and tournament venue. Then the teams and their
+    players are entered and the pairings of the teams are created.
+
+    Returns a dictionary with the tournament data, or None if the data could
+    not be saved.
+    """
+    tournament = {"type": "team"}
+
+    print("\n\nNeues Mannschaftsturnier anlegen")
+    print("================================\n")
+
+    while True:
+        tournament_name = input("Turnierbezeichnung.... > ").strip()
+        if tournament_name:
+            tournament["name"] = tournament_name
+            break
+    while True:
+        tournament_teams = input("Mannschaften.......... > ").strip()
+        if tournament_teams.isnumeric():
+            tournament["teams"] = int(tournament_teams)
+            break
+    while True:
+        tournament_boards = input("Bretter............... > ").strip()
+        if tournament_boards.isnumeric() and int(tournament_boards) > 0:
+            tournament["boards"] = int(tournament_boards)
+            break
+    while True:
+        tournament_cycles = input("Durchgänge (ENTER: 1). > ").strip()
+        if not tournament_cycles:
+            tournament["cycles"] = 1
+            break
+        if tournament_cycles.isnumeric() and int(tournament_cycles) > 0:
+            tournament["cycles"] = int(tournament_cycles)
+            break
+    while True:
+        tournament_venue = input("Spielort.............. > ").strip()
+        if tournament_venue:
+            tournament["venue"] = tournament_venue
+            break
+    while True:
+        tournament_end = input("Turnierende (yy-mm-dd) > ").strip()
+        if tournament_end:
+            tournament["last_round"] = tournament_end
+            break
+
+    tournament["player_list"] = create_team_list(tournament["teams"],
+                                                 tournament["boards"])
+    tournament["rounds"] = create_pairing_list(len(tournament["player_list"]),
+                                               "_" * tournament["boards"])
+    clear_render_cache(tournament)
+
+    error = write_tournament_data(tournament)
+
+    if error == "OK":
+        return tournament
+    else:
+        print(f"\n\nERROR: {error}\n\n")
+        return None
+
+
+def create_team_list(number_teams, boards):
+    """Lets the user enter the name of every team and the names of its players
+    in board order. A board without a name is filled with "N.N.". If the
+    number of teams is odd, a bye ("spielfrei") is added as the last team.
+    Returns the list of team dictionaries.
+    """
+    team_list = list()
+
+    for i in range(1, number_teams+1):
+        tmp_str = f"Mannschaft {i}/{number_teams}"
+        print("\n" + tmp_str)
+        print("-" * len(tmp_str))
+        while True:
+            name = input("Name der Mannschaft... > ").strip()
+            if name:
+                break
+        players = list()
+        for board in range(1, boards+1):
+            player = input(f"Brett {board:2d}.............. > ").strip()
+            players.append({"name": player if player else "N.N."})
+        team_list.append({"name": name, "players": players})
+
+    if number_teams % 2 != 0:
+        team_list.append({"name": "spielfrei", "players": []})
+
+    return team_list
+
+
+def get_board_players(tournament, pairing, board):
+    """Returns a tuple with the player dictionaries of white and black on the
+    board with the 0-based index "board" of a match. The first team of the
+    pairing has white on the boards 1, 3, ..., i.e. on the even indices.
+    """
+    players = list()
+    for team in pairing[:2]:
+        team_players = tournament["player_list"][team-1]["players"]
+        players.append(team_players[board] if board < len(team_players)
+                       else {"name": "N.N."})
+
+    return tuple(players) if board % 2 == 0 else tuple(reversed(players))
+
+
+@lru_cache(maxsize = None)
+def match_score(results):
+    """Returns a tuple (board points of both teams, Berlin tie-break of both
+    teams, number of open boards) for the result string of a match. For the
+    Berlin tie-break, a point on board 1 of B boards counts B times, a point
+    on the last board once.
+
+    The same result strings occur in many matches, so the scores are memoized
+    and every string is only evaluated once per session.
+    """
+    boards = len(results)
+    points = [0, 0]
+    berlin = [0, 0]
+
+    for board, result in enumerate(results):
+        white, black = RESULT2POINTS[result]
+        first, second = (white, black) if board % 2 == 0 else (black, white)
+        points[0] += first
+        points[1] += second
+        berlin[0] += first * (boards - board)
+        berlin[1] += second * (boards - board)
+
+    return tuple(points), tuple(berlin), results.count("_")
+
+
+def team_scores(tournament, R):
+    """Returns a list with [match points, board points, Berlin tie-break] for
+    every team after round R. Every match is evaluated with a single look-up
+    of its result string in match_score. Match points are only awarded when a
+    match is decided, i.e. when all boards have been played or one team
+    already has more than half of the board points. Matches against the bye
+    are not counted.
+    """
+    scores = [[0, 0, 0] for _ in tournament["player_list"]]
+    half = tournament["boards"] / 2
+    byes = {i for i, team in enumerate(tournament["player_list"], 1)
+            if team["name"] == "spielfrei"}
+
+    for pairings in tournament["rounds"][:R]:
+        for team_a, team_b, results in pairings:
+            if team_a in byes or team_b in byes:
+                continue
+            points, berlin, open_boards = match_score(results)
+            for team, own, other in ((team_a, 0, 1), (team_b, 1, 0)):
+                score = scores[team-1]
+                score[1] += points[own]
+                score[2] += berlin[own]
+                if points[own] > half or not open_boards:
+                    score[0] += MATCH_POINTS[0] if points[own] > points[other] \
+                        else MATCH_POINTS[1] if points[own] == points[other] \
+                        else MATCH_POINTS[2]
+                elif points[other] > half:
+                    score[0] += MATCH_POINTS[2]
+
+    return scores
+
+
+def print_team_pairings(tournament, R):
+    """Print the matches of round R with the board points of both teams and,
+    below every match, the games on all boards. The text is taken from the
+    render cache if no result of round R has changed. Return value is always
+    None.
+    """
+    text = get_rendered(tournament, R, "team_pairings")
+
+    if text is None:
+        teams = tournament["player_list"]
+        lines = list()
+
+        for match, pairing in enumerate(get_round(tournament, R), 1):
+            team_a = teams[pairing[0]-1]["name"][:25]
+            team_b = teams[pairing[1]-1]["name"][:25]
+            points, _, open_boards = match_score(pairing[2])
+            result = "" if open_boards == len(pairing[2]) \
+                else f"{points[0]} - {points[1]}"
+
+            lines.append(f"{match:2d}. {team_a:25s} - {team_b:25s}  "
+                         f"{result}\n")
+
+            for board, board_result in enumerate(pairing[2]):
+                white, black = get_board_players(tournament, pairing, board)
+                lines.append(f"    {board+1:2d}: {white['name'][:22]:22s} - "
+                             f"{black['name'][:22]:22s}  "
+                             f"{EXPAND_RESULT[board_result]}\n")
+
+        text = store_rendered(tournament, R, "team_pairings", "".join(lines))
+
+    print(text)
+
+    return None
+
+
+def update_board_result(tournament, R, match, board, result):
+    """Change the result on one board (1-based) of match number "match" in
+    round R, print the updated round and save the tournament data. Returns
+    the tournament data, or None if the data could not be saved.
+    """
+    pairing = get_round(tournament, R)[match-1]
+    pairing[2] = pairing[2][:board-1] + result + pairing[2][board:]
+    invalidate_round(tournament, R)
+
+    tmp_str = f"Aktualisierte Resultate in Runde {R}:"
+    print("\n" + tmp_str)
+    print("-" * len(tmp_str))
+    print_team_pairings(tournament, R)
+
+    error = update_game_data(tournament, R, match)
+
+    if error == "OK":
+        return tournament
+    else:
+        print(f"\n\nERROR: {error}\n\n")
+        return None
+
+
+def print_team_standings(tournament, R):
+    """Print the teams sorted by match points, board points and Berlin
+    tie-break after round R. Used for the screen and the text export. The
+    text is taken from the render cache if no result of the rounds 1...R has
+    changed.
+    """
+    text = get_rendered(tournament, R, "team_standings")
+
+    if text is None:
+        scores = team_scores(tournament, R)
+        ranking = sorted(range(len(scores)), key = lambda k: scores[k],
+                         reverse = True)
+
+        tmp_str = f"Stand nach Runde {R}:"
+        lines = ["\n" + tmp_str + "\n", "=" * len(tmp_str) + "\n"]
+
+        for rank, team_index in enumerate(ranking, 1):
+            team_name = tournament["player_list"][team_index]["name"]
+            match_points, board_points, berlin = scores[team_index]
+
+            if team_name == "spielfrei":
+                continue
+
+            lines.append(f"{rank:2d}. {team_name[:25]:25s}  "
+                         f"{match_points:2d} MP, {board_points:5.1f} BP, "
+                         f"{berlin:6.1f} BW\n")
+
+        text = store_rendered(tournament, R, "team_standings", "".join(lines))
+
+    print(text, end="")
+
+    return None
+
+
+def write_team_pairings_to_file(tournament, R):
+    """Print the standings after round R-1 and the pairings of round R of a
+    team tournament into an ASCII text file, like write_pairings_to_file for
+    individual tournaments. Returns "OK" or the error message.
+    """
+    filename = tournament["name"].replace(" ", "_") + f"_R{R}" + ".txt"
+
+    error = switch_stdout(filename)
+    if error != "OK":
+        return error
+
+    tmp_str = "CARL-FRIEDRICH V1.0"
+    print("=" * (len(tmp_str) + 8))
+    print("=== " + tmp_str + " ===")
+    print("=" * (len(tmp_str) + 8) + "\n")
+
+    tmp_str = f"Zwischenstand und Paarungsliste für Runde {R}:"
+    print(tmp_str)
+    print("-" * len(tmp_str))
+
+    print_team_standings(tournament, R-1)
+
+    tmp_str = f"Paarungen in Runde {R}:"
+    print("\n" + tmp_str)
+    print("=" * len(tmp_str))
+
+    print_team_pairings(tournament, R)
+
+    return switch_stdout()
+
+
+def main():
+    """Just a placeholder, does nothing.
+    """
+    pass
+
+
+if __name__ == "__main__":
+    main()
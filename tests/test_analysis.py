@@ -0,0 +1,63 @@
+"""
+Compares points_needed and points_to_clinch with trying all possible results
+of the open games, for small random tournaments.
+"""
+
+
+import itertools
+import random
+import unittest
+
+from analysis import points_needed, points_to_clinch
+
+
+def brute_force(scores, games, player, k):
+    """Tries all results of the open games and returns a tuple (fewest half
+    points with which the player ends among the first k, fewest half points
+    with which no other player ends above the player), or None for a number
+    that does not exist.
+    """
+    needed = None
+    safe = dict()
+    for outcome in itertools.product((0, 1, 2), repeat = len(games)):
+        final = list(scores)
+        own = 0
+        for (white, black), points in zip(games, outcome):
+            final[white] += points
+            final[black] += 2 - points
+            if player == white:
+                own += points
+            elif player == black:
+                own += 2 - points
+        above = sum(1 for i, score in enumerate(final)
+                    if i != player and score > final[player])
+        if above < k:
+            needed = own if needed is None else min(needed, own)
+        safe[own] = safe.get(own, True) and above == 0
+
+    clinch = min((own for own, ok in safe.items() if ok), default = None)
+    return needed, clinch
+
+
+class TestAnalysis(unittest.TestCase):
+
+    def test_same_results_as_brute_force(self):
+        rng = random.Random(5)
+        for _ in range(150):
+            number_players = rng.randint(3, 6)
+            scores = [rng.randint(0, 8) for _ in range(number_players)]
+            pairs = list(itertools.combinations(range(number_players), 2))
+            rng.shuffle(pairs)
+            games = pairs[:rng.randint(1, min(7, len(pairs)))]
+            k = rng.choice((1, 1, 2, 3))
+            for player in range(number_players):
+                needed, clinch = brute_force(scores, games, player, k)
+                self.assertEqual(points_needed(scores, games, player, k),
+                                 (needed, True))
+                if k == 1:
+                    self.assertEqual(points_to_clinch(scores, games, player),
+                                     clinch)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Compares search_players with a brute force search over all players of the
+index, for random names built from a few syllables so that many names share
+trigrams and many scores are equal.
+"""
+
+
+import heapq
+import random
+import unittest
+
+from playerindex import MIN_SIMILARITY, create_player_index, get_trigrams, \
+                        normalize_name, search_players
+
+
+SYLLABLES = ["ma", "ri", "hans", "bo", "kai", "yz", "er", "mei", "schu", "l"]
+
+
+def random_name(rng):
+    words = rng.randint(1, 3)
+    return " ".join("".join(rng.choice(SYLLABLES)
+                            for _ in range(rng.randint(1, 3)))
+                    for _ in range(words))
+
+
+def brute_force(index, query, limit):
+    """Scores every player of the index and returns the best "limit" players
+    in the same order as search_players.
+    """
+    trigrams = get_trigrams(normalize_name(query))
+    scores = list()
+    for key, position in index["keys"].items():
+        common = len(trigrams & get_trigrams(key))
+        if trigrams and common:
+            scores.append((2 * common / (len(trigrams)
+                                         + index["sizes"][position]),
+                           position))
+
+    return [index["players"][position]
+            for score, position in heapq.nlargest(limit, scores)
+            if score >= MIN_SIMILARITY]
+
+
+class SearchPlayersTest(unittest.TestCase):
+
+    def test_threshold_from_complete_match(self):
+        index = create_player_index([{"name": name} for name in
+                                     ["hans", "bo", "kai", "yz"]])
+        self.assertEqual(search_players(index, "hans bo", 1),
+                         [{"name": "hans"}])
+
+    def test_same_results_as_brute_force(self):
+        rng = random.Random(1)
+        for _ in range(30):
+            index = create_player_index([{"name": random_name(rng)}
+                                         for _ in range(rng.randint(1, 300))])
+            for _ in range(100):
+                query = random_name(rng)
+                limit = rng.randint(1, 10)
+                self.assertEqual(search_players(index, query, limit),
+                                 brute_force(index, query, limit),
+                                 (query, limit))
+
+
+if __name__ == "__main__":
+    unittest.main()
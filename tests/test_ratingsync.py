@@ -0,0 +1,149 @@
+"""
+Runs sync_ratings against a small local stand-in for the DSB search page
+(http.server), which answers with an ETag and with status 304 as long as the
+ratings of a player have not changed. The tournaments are stored as json files
+in a temporary folder.
+"""
+
+
+import os
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import datastorage
+import ratingsync
+import webscraper
+
+
+# DWZ of the players in the stand-in database
+RATINGS = dict()
+# Requests received by the stand-in: (status, name)
+requests = list()
+
+
+class DSBHandler(BaseHTTPRequestHandler):
+    """Answers a search with a page like the DSB search page: the players
+    are listed in the second table.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        name = urllib.parse.unquote(self.path.split("search=")[1])
+        etag = f'"{name}-{RATINGS.get(name)}"'
+        if self.headers.get("If-None-Match") == etag:
+            requests.append((304, name))
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        requests.append((200, name))
+        rows = ""
+        if name in RATINGS:
+            rows = (f"<tr><td>{name}</td><td>{RATINGS[name]}-12</td>"
+                    "<td>-----</td><td>SK Test</td></tr>")
+        body = ("<html><table><tr><td>Suche</td></tr></table><table><tr>"
+                "<th>Spielername</th><th>DWZ</th><th>Elo</th><th>Verein</th>"
+                f"</tr>{rows}</table></html>").encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_tournament(name, players):
+    return datastorage.write_tournament_data(
+            {"name": name, "venue": "Test", "last_round": "2021-04-07",
+             "player_list": players, "rounds": [[[1, 2, "_"]]]})
+
+
+class TestSyncRatings(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), DSBHandler)
+        threading.Thread(target = self.server.serve_forever,
+                         daemon = True).start()
+        patcher = mock.patch.object(webscraper, "DB_DSB",
+            f"http://127.0.0.1:{self.server.server_port}/spieler.html?search=")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)
+        os.makedirs(datastorage.DATA_PATH)
+        self.backend = datastorage.storage_backend
+        datastorage.set_storage_backend("json")
+
+        RATINGS.clear()
+        RATINGS.update({"Meier,Hans": 1800, "Müller,Anna": 1650})
+        requests.clear()
+
+    def tearDown(self):
+        datastorage.set_storage_backend(self.backend)
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sync(self):
+        """Runs sync_ratings and returns its result and the tournaments that
+        have been written.
+        """
+        requests.clear()
+        with mock.patch.object(ratingsync, "write_tournament_data",
+                               wraps = datastorage.write_tournament_data) \
+                as write:
+            result = ratingsync.sync_ratings()
+
+        return result, sorted(call.args[0]["name"]
+                              for call in write.call_args_list)
+
+    def test_conditional_requests(self):
+        create_tournament("A", [
+            {"name": "Meier,Hans", "DWZ": 1700, "evals": 10,
+             "club": "SK Test"},
+            {"name": "Müller,Anna", "DWZ": 1650, "evals": 12,
+             "club": "SK Test"}])
+        create_tournament("B", [
+            {"name": "Müller,Anna", "DWZ": 1650, "evals": 12,
+             "club": "SK Test"},
+            {"name": "Hand,Eingabe", "DWZ": 1400}])
+
+        # First run: every page is downloaded, only A has a changed rating
+        (names, downloads, changed, errors), written = self.sync()
+        self.assertEqual((names, downloads, changed, errors),
+                         (3, 3, ["A"], list()))
+        self.assertEqual(written, ["A"])
+        self.assertEqual(sorted(requests), [(200, "Hand,Eingabe"),
+                                            (200, "Meier,Hans"),
+                                            (200, "Müller,Anna")])
+
+        # Second run: the server only confirms the cached pages
+        (names, downloads, changed, errors), written = self.sync()
+        self.assertEqual((names, downloads, changed, errors),
+                         (3, 0, list(), list()))
+        self.assertEqual(written, list())
+        self.assertEqual([status for status, _ in requests], [304] * 3)
+
+        # Changed page: only this page is downloaded again, and only the
+        # tournaments of the player are written
+        RATINGS["Müller,Anna"] = 1700
+        (names, downloads, changed, errors), written = self.sync()
+        self.assertEqual((downloads, changed), (1, ["A", "B"]))
+        self.assertEqual(written, ["A", "B"])
+        self.assertIn((200, "Müller,Anna"), requests)
+
+        players = datastorage.read_tournament_data("B.json")["player_list"]
+        self.assertEqual(players[0]["DWZ"], 1700)
+        self.assertEqual(players[1], {"name": "Hand,Eingabe", "DWZ": 1400})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+"""
+Compares the closed-form check validate_rotation with validate_pairing_table
+on the calculated Berger tables.
+"""
+
+
+import unittest
+
+from tournament import compute_pairing_table, validate_pairing_table, \
+                       validate_rotation
+
+
+class TestValidateRotation(unittest.TestCase):
+
+    def test_same_as_table_check(self):
+        for number_players in range(2, 61, 2):
+            table = compute_pairing_table(number_players)
+            self.assertEqual(validate_rotation(number_players), "OK")
+            self.assertEqual(validate_pairing_table(table), "OK")
+
+    def test_odd_number_of_players(self):
+        self.assertNotEqual(validate_rotation(7), "OK")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Reads a search page in the layout of the DSB player search
+(fixtures/dsb_search.html) with read_player_table, and compares time and
+memory of DSBTableParser with pandas.read_html, which was used before. The
+comparison is skipped if pandas is not installed.
+"""
+
+
+import importlib.util
+import io
+import os
+import time
+import tracemalloc
+import unittest
+from email.message import Message
+from unittest import mock
+
+import webscraper
+from webscraper import DSBTableParser, read_player_table
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures",
+                       "dsb_search.html")
+# Number of parses for the timing
+REPEAT = 20
+
+
+class FakeResponse(io.BytesIO):
+    """Stands in for the HTTP response: the page and its headers.
+    """
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.headers = Message()
+        self.headers["Content-Type"] = "text/html; charset=utf-8"
+
+
+def read_fixture():
+    with open(FIXTURE, "rb") as fin:
+        return fin.read()
+
+
+def parse_with_parser(text):
+    parser = DSBTableParser()
+    parser.feed(text)
+    return parser.players
+
+
+def parse_with_pandas(text):
+    """The player table as read by the earlier version with pandas.
+    """
+    import pandas
+
+    table = pandas.read_html(io.StringIO(text))[webscraper.DSB_TABLE_INDEX]
+    return [webscraper.convert_table_row(
+                {key: "" if pandas.isna(value) else str(value)
+                 for key, value in row.items()})
+            for row in table.to_dict("records")]
+
+
+def measure(function, text):
+    """Returns a tuple (seconds per call, peak memory in bytes).
+    """
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function(text)
+    seconds = (time.perf_counter() - start) / REPEAT
+
+    tracemalloc.start()
+    try:
+        function(text)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return seconds, peak
+
+
+class TestDSBTableParser(unittest.TestCase):
+
+    def test_read_player_table(self):
+        data = read_fixture()
+        response = FakeResponse(data)
+        players = read_player_table(response)
+
+        self.assertEqual(len(players), 40)
+        self.assertEqual(players[0], {"name": "Köhler,Jürgen", "DWZ": 998,
+                                      "evals": 19, "ELO": 1496,
+                                      "club": "TSV Grünwald"})
+        # Provisional rating ("Restp.") and no Elo ("-----")
+        self.assertEqual(players[3], {"name": "Weiß,Jörg",
+                                      "club": "SV Schwäbisch Hall"})
+        # The rest of the page after the player table is not downloaded
+        self.assertLess(response.tell(), len(data))
+
+    def test_small_blocks(self):
+        """Blocks that end inside a tag or an umlaut give the same players.
+        """
+        data = read_fixture()
+        with mock.patch.object(webscraper, "CHUNK_SIZE", 7):
+            players = read_player_table(FakeResponse(data))
+
+        self.assertEqual(players, read_player_table(FakeResponse(data)))
+
+    @unittest.skipIf(importlib.util.find_spec("pandas") is None,
+                     "pandas is not installed")
+    def test_compare_with_pandas(self):
+        text = read_fixture().decode("utf-8")
+        self.assertEqual([player["name"] for player in parse_with_pandas(text)],
+                         [player["name"] for player in parse_with_parser(text)])
+
+        parser_time, parser_peak = measure(parse_with_parser, text)
+        pandas_time, pandas_peak = measure(parse_with_pandas, text)
+        print(f"\nDSBTableParser: {parser_time * 1000:.2f} ms, "
+              f"{parser_peak / 1024:.0f} KiB peak")
+        print(f"pandas.read_html: {pandas_time * 1000:.2f} ms, "
+              f"{pandas_peak / 1024:.0f} KiB peak")
+        self.assertLess(parser_peak, pandas_peak)
+
+
+if __name__ == "__main__":
+    unittest.main()
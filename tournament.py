@@ -12,7 +12,7 @@ Version: 1.0
 Data structure:
 ===============
     Dictionary 'tournament' contains key data (name, number of players and
-    rounds, venue, date of last round), player list (supplemented by an
+    cycles, venue, date of last round), player list (supplemented by an
     additional player to manage byes, if odd) with fixed order (index used for
     abbreviation of pairing tables and standings), pairings for each round as a
     list of lists containing the indices of the players at the given virtual
@@ -51,13 +51,53 @@ return_pairings(R, positions)
     Returns the pairings for the next round, based on the positions provided as
     a parameter. Swaps colours for player n if n is an odd number.
 
-create_pairing_list(number_players)
+compute_pairing_table(number_players)
+    Calculates the Berger table for an even number of players by repeated
+    rotation of the player positions, without placeholders for the results.
+
+get_pairing_table(number_players)
+    Returns the Berger table for number_players from a memoized cache. The
+    FIDE tables are persisted in the folder ./data/cache, one file per size.
+
+validate_rotation(number_players)
+    Checks in closed form that the rotation of create_new_round and
+    return_pairings yields a valid Berger table for number_players, without
+    calculating the table.
+
+validate_pairing_table(table)
+    Checks that every player plays once per round, that every pair of players
+    meets exactly once and that the colours are balanced for every player.
+
+create_pairing_list(number_players, placeholder)
     Returns a list with the pairings for all rounds, always consisting of the
     id of the white and black player and a placeholder for the result,
     initially "_" for an open result.
 
+create_optimised_pairing_list(tournament)
+    Asks for the rounds in which players cannot play and returns a pairing
+    list with the Berger table rearranged for clubs, absences and colours.
+
+generate_rounds(number_players, cycles, first_round, placeholder, table)
+    Generator that yields the pairings round by round for a tournament with
+    one or more cycles, with colours reversed in every other cycle.
+
+number_rounds(tournament)
+    Returns the total number of rounds of a tournament over all cycles.
+
+get_first_cycle(tournament)
+    Returns the pairings of the first cycle without results.
+
+get_round(tournament, R)
+    Returns the pairings of round R. Rounds of later cycles are only added to
+    the tournament data when a round of that cycle is accessed.
+
 print_pairings(tournament, R)
     Print the pairings for a given round R from a complete tournament data set.
+    The formatted text is kept in the render cache until a result changes.
+
+set_result(tournament, R, game, result)
+    Set the result of a game in round R without printing or saving the data
+    and return the previous result of that game.
 
 update_result(tournament, R, game, result)
     Update the result of a game in round R of the tournament with the result
@@ -71,7 +111,15 @@ refresh_scores(tournament, R)
 
 print_standings(tournament, R)
     Update the scores using "refresh_scores", then print a sorted list of
-    players and scores to stdout (can be a file or the screen).
+    players and scores to stdout (can be a file or the screen). Uses the
+    render cache if the results up to round R have not changed.
+
+format_ranking(tournament, title)
+    Return the players sorted by the scores in the "standings" entry of the
+    tournament data as text, without calculating the scores first.
+
+print_ranking(tournament, title)
+    Print the text returned by format_ranking.
 
 write_pairings_to_file(tournament, R)
     Redirect the output to a file, then print the intermediate standings after
@@ -82,8 +130,15 @@ main()
     Just a placeholder, does nothing.
 """
 
+import math
+
 from datastorage import write_tournament_data, read_tournament_data, \
-                        get_tournament_filename, switch_stdout
+                        update_game_data, get_tournament_filename, \
+                        switch_stdout, write_pairing_table, \
+                        read_pairing_table
+from rendercache import get_rendered, store_rendered, invalidate_round, \
+                        clear_render_cache
+from scheduler import optimise_schedule, get_unavailable_rounds
 from webscraper import create_player_list, print_player_list
 
 
@@ -107,6 +162,14 @@ RESULT2POINTS = {
         "_": [0,0]       # No result yet
         }
 
+# Numbers of players for which the FIDE handbook publishes Berger tables (odd
+# numbers of players use the table for the next even number with a bye)
+FIDE_TABLE_SIZES = range(4, 17, 2)
+
+# Memoized Berger tables, keyed by the number of players. The FIDE tables are
+# loaded from the cache folder on first use.
+pairing_tables = dict()
+
 
 def create_new_tournament():
     """Ask user for details of a newly created tournament: name, number of
@@ -131,6 +194,14 @@ def create_new_tournament():
         if tournament_players.isnumeric():
             tournament["players"] = int(tournament_players)
             break
+    while True:
+        tournament_cycles = input("Durchgänge (ENTER: 1). > ").strip()
+        if not tournament_cycles:
+            tournament["cycles"] = 1
+            break
+        if tournament_cycles.isnumeric() and int(tournament_cycles) > 0:
+            tournament["cycles"] = int(tournament_cycles)
+            break
     while True:
         tournament_venue = input("Spielort.............. > ").strip()
         if tournament_venue:
@@ -146,8 +217,15 @@ def create_new_tournament():
     # to make the number of players an even number. The "players" entry in the
     # dictionary remains unchanged. It counts only the real players.
     tournament["player_list"] = create_player_list(tournament["players"])
+    # Only the rounds of the first cycle are created, further cycles are added
+    # when they are reached (see get_round)
     tournament["rounds"] = create_pairing_list(len(tournament["player_list"]))
+    optimise = input("\nSpielplan nach Vereinen, Abwesenheiten und Farben"
+                     " optimieren (j/N) > ")
+    if optimise.strip().lower().startswith("j"):
+        tournament["rounds"] = create_optimised_pairing_list(tournament)
     tournament["standings"] = list([0]*len(tournament["player_list"]))
+    clear_render_cache(tournament)
 
     error = write_tournament_data(tournament)
 
@@ -169,6 +247,7 @@ def load_tournament():
         if isinstance(tournament, Exception):
             print(f"\n\nERROR: {tournament}")
             return None
+        clear_render_cache(tournament)
 
         tmp_str = "Teilnehmerliste " + tournament["name"]
         print("\n\n" + tmp_str)
@@ -227,53 +306,309 @@ def return_pairings(R, positions):
     return pairings
 
 
-def create_pairing_list(number_players):
-    """Returns a list with pairings for each round of the tournaments the
-    pairings are triples of two player indices and a character that indicates
-    the outcome of a game according to the conversion dictionary RESULT2POINTS.
-
-    number_players corresponds to the number of real players plus a bye if the
-    number of players is an odd number. This bye is always the player with the
-    highest index in the player list.
+def compute_pairing_table(number_players):
+    """Returns the Berger table for an even number of players as a list of
+    rounds, each round being a list of [white, black] pairs of player indices.
+    The table is calculated by rotation of the player positions and is
+    identical to the tables published by the FIDE.
 
     Positions and pairings are kept separately because the colours at the board
     where player n plays are swapped every other round.
     """
-    pairing_list = list()
+    table = list()
 
     # Round 1: players are sorted in order, from then on use shifting scheme
     R = 1
     positions = list(range(1, number_players+1))
 
-    # For all rounds: add pairing list to local variable, then increase R for
-    # next round and rotate player positions
+    # For all rounds: add pairings without result placeholder to the table,
+    # then increase R for next round and rotate player positions
     while R <= number_players - 1:
-        pairing_list.append(return_pairings(R, positions))
+        table.append([pairing[:2] for pairing in return_pairings(R, positions)])
         positions = create_new_round(positions)
         R += 1
 
-    return pairing_list
+    return table
+
+
+def get_pairing_table(number_players):
+    """Returns the Berger table for number_players (even number) from the
+    memoized pairing tables. The FIDE tables for 4 to 16 players are read
+    from their own files in the cache folder, or calculated and written there
+    on first use, so that a file only contains the table that is needed.
+    Tables for other numbers of players are only kept in memory: for large
+    numbers of players, reading a table from a json file takes as long as
+    calculating it. Before a table is calculated, validate_rotation checks
+    that the rotation yields a valid table for number_players.
+
+    The returned table is shared with the cache and must not be changed.
+    """
+    if number_players not in pairing_tables:
+        table = None
+        if number_players in FIDE_TABLE_SIZES:
+            table = read_pairing_table(number_players)
+            # A damaged cache file is replaced by a new calculation
+            if table is not None and validate_pairing_table(table) != "OK":
+                table = None
+        if table is None:
+            # Checked once per size in closed form, which is much faster than
+            # validate_pairing_table on the calculated table
+            error = validate_rotation(number_players)
+            assert error == "OK", error
+            table = compute_pairing_table(number_players)
+            if number_players in FIDE_TABLE_SIZES:
+                # The cache is optional, an error only means that the table
+                # has to be calculated again next time.
+                write_pairing_table(number_players, table)
+        pairing_tables[number_players] = table
+
+    return pairing_tables[number_players]
+
+
+def validate_rotation(number_players):
+    """Checks in closed form, i.e. without calculating the table, that the
+    rotation of create_new_round and return_pairings yields a valid Berger
+    table for number_players: every player plays once per round, every pair
+    of players meets exactly once and the colours are balanced.
+
+    Player n keeps place n-1 and the other players move by the same number of
+    places s in every round. If s and n-1 have no common divisor, every player
+    but n sits at every place 0...n-2 exactly once in the n-1 rounds, so n
+    meets everybody once at place 0. Places k and n-1-k play each other, so
+    two other players meet when the sum of their places is a multiple of n-1.
+    The sum changes by 2s (modulo n-1) per round, and since n-1 is odd, this
+    happens in exactly one round. Every player but n plays white at the
+    places 1...n/2-1 and at place 0 in every other round, i.e. n/2-1 or n/2
+    times, player n alternates. Only one rotation and the pairings of two
+    rounds have to be calculated for this check, so it takes a few
+    milliseconds even for 10,000 players.
+
+    Returns "OK" if all tables calculated for number_players are valid,
+    otherwise a description of the error.
+    """
+    n = number_players
+    if n < 2 or n % 2 != 0:
+        return f"{n} ist keine gerade Spielerzahl"
+
+    start = list(range(1, n + 1))
+    positions = create_new_round(start)
+    if positions[n-1] != n:
+        return f"Spieler {n} bleibt nicht an seinem Platz"
+    step = (positions[0] - 1) % (n - 1)
+    if positions[:n-1] != [(k + step) % (n - 1) + 1 for k in range(n - 1)] \
+            or math.gcd(step, n - 1) != 1:
+        return "Die Rotation erreicht nicht alle Plätze"
+
+    # Boards in round 1 and 2, as pairs of places (0-based)
+    odd = [(white - 1, black - 1) for white, black, _ in
+           return_pairings(1, start)]
+    even = [(white - 1, black - 1) for white, black, _ in
+            return_pairings(2, start)]
+    boards = [(0, n - 1)] + [(k, n - 1 - k) for k in range(1, n // 2)]
+    if odd != boards or even != [(n - 1, 0)] + boards[1:]:
+        return "Die Paarungen passen nicht zu den Plätzen"
+
+    return "OK"
+
+
+def validate_pairing_table(table):
+    """Checks a pairing table (list of rounds with [white, black] pairs) for a
+    round-robin tournament: every player must play exactly once per round,
+    every pair of players must meet exactly once, and every player must have
+    the same number of white and black games, or one more of either colour.
+
+    Every game has to be looked at, so the time grows with the square of the
+    number of players (about 0.2 seconds for 1,000 and 2 seconds for 3,000
+    players). Tables calculated by rotation do not need this check, see
+    validate_rotation. Every pair is marked in a flat triangular bytearray
+    instead of a set of tuples. Returns "OK" if the table is valid, otherwise
+    a description of the first error.
+    """
+    n = len(table) + 1
+    if n % 2 != 0:
+        return f"{len(table)} Runden passen zu keiner geraden Spielerzahl"
+
+    # Pair (a, b) with a < b is stored at index (b-1)*(b-2)/2 + a-1
+    met = bytearray(n * (n - 1) // 2)
+    whites = [0] * (n + 1)
+
+    for R, pairings in enumerate(table, 1):
+        if len(pairings) != n // 2:
+            return f"Runde {R} hat {len(pairings)} statt {n // 2} Partien"
+        players = set()
+        for white, black in pairings:
+            players.add(white)
+            players.add(black)
+            if white < black:
+                pair = (black - 1) * (black - 2) // 2 + white - 1
+            else:
+                pair = (white - 1) * (white - 2) // 2 + black - 1
+            if met[pair]:
+                return f"{white} und {black} spielen mehrfach gegeneinander"
+            met[pair] = 1
+            whites[white] += 1
+        if players != set(range(1, n + 1)):
+            return f"In Runde {R} spielen nicht alle Spieler genau einmal"
+
+    # Every player plays n-1 games, i.e. whites - blacks = 2*whites - (n-1)
+    for player in range(1, n + 1):
+        if abs(2 * whites[player] - (n - 1)) > 1:
+            return f"Spieler {player} hat {whites[player]} Weißpartien"
+
+    return "OK"
+
+
+def create_pairing_list(number_players, placeholder = "_"):
+    """Returns a list with pairings for each round of the tournaments the
+    pairings are triples of two player indices and a character that indicates
+    the outcome of a game according to the conversion dictionary RESULT2POINTS.
+
+    number_players corresponds to the number of real players plus a bye if the
+    number of players is an odd number. This bye is always the player with the
+    highest index in the player list.
+
+    The pairings are taken from the memoized Berger tables, the results are
+    added as new lists so that the cached table is not changed. Team
+    tournaments use one "_" per board as placeholder for the results.
+    """
+    table = get_pairing_table(number_players)
+
+    return [[[white, black, placeholder] for white, black in pairings]
+            for pairings in table]
+
+
+def create_optimised_pairing_list(tournament):
+    """Lets the user enter the rounds in which the players cannot play, then
+    rearranges the Berger table with optimise_schedule (see scheduler.py) so
+    that players of the same club meet early, absent players get the bye or
+    few games in their absent rounds and colours alternate. Returns the
+    pairing list of the first cycle, which is the plain Berger table if no
+    better schedule has been found.
+    """
+    number_players = len(tournament["player_list"])
+    table = get_pairing_table(number_players)
+    unavailable = get_unavailable_rounds(tournament["player_list"],
+                                         number_rounds(tournament))
+
+    print("\nSuche Spielplan ...")
+    schedule, costs, standard_costs = optimise_schedule(
+            table, tournament["player_list"], unavailable)
+
+    if schedule is table or validate_pairing_table(schedule) != "OK":
+        print("Keine Verbesserung gefunden, es gilt die Berger-Tabelle.")
+        return create_pairing_list(number_players)
+
+    print(f"Spielplan optimiert (Kosten {costs} statt {standard_costs}).")
+
+    return [[[white, black, "_"] for white, black in pairings]
+            for pairings in schedule]
+
+
+def generate_rounds(number_players, cycles = 1, first_round = 1,
+                    placeholder = "_", table = None):
+    """Generator that yields the pairings of all rounds from round first_round
+    on for a tournament with "cycles" cycles (single, double, ... round-robin).
+    Every cycle repeats the first cycle "table" (a list of rounds with [white,
+    black] pairs, by default the Berger table), with colours reversed in every
+    other cycle. Rounds are created one at a time, so only the rounds that
+    are actually requested are ever held in memory.
+    """
+    if table is None:
+        table = get_pairing_table(number_players)
+    rounds_per_cycle = len(table)
+
+    for R in range(first_round, rounds_per_cycle * cycles + 1):
+        cycle, index = divmod(R - 1, rounds_per_cycle)
+        if cycle % 2 == 0:
+            yield [[white, black, placeholder]
+                   for white, black in table[index]]
+        else:
+            yield [[black, white, placeholder]
+                   for white, black in table[index]]
+
+
+def number_rounds(tournament):
+    """Returns the number of rounds of the tournament over all cycles. Older
+    tournament files without the entry "cycles" have a single cycle.
+    """
+    rounds_per_cycle = len(tournament["player_list"]) - 1
+
+    return rounds_per_cycle * tournament.get("cycles", 1)
+
+
+def get_first_cycle(tournament):
+    """Returns the pairings of the first cycle as a list of rounds with
+    [white, black] pairs, without the results, as the table for the later
+    cycles.
+    """
+    rounds_per_cycle = len(tournament["player_list"]) - 1
+
+    return [[pairing[:2] for pairing in pairings]
+            for pairings in tournament["rounds"][:rounds_per_cycle]]
+
+
+def get_round(tournament, R):
+    """Returns the pairings of round R. If round R belongs to a cycle that has
+    not been reached yet, the rounds up to the end of that cycle are appended
+    to tournament["rounds"] first, so that results are only stored for cycles
+    that are being played. Later cycles repeat the pairings of the stored
+    first cycle, which may be an optimised schedule instead of the Berger
+    table.
+    """
+    rounds = tournament["rounds"]
+
+    if R > len(rounds):
+        rounds_per_cycle = len(tournament["player_list"]) - 1
+        last_round = -(-R // rounds_per_cycle) * rounds_per_cycle
+        new_rounds = generate_rounds(len(tournament["player_list"]),
+                                     tournament.get("cycles", 1),
+                                     len(rounds) + 1,
+                                     "_" * tournament.get("boards", 1),
+                                     get_first_cycle(tournament))
+        for _ in range(len(rounds), last_round):
+            rounds.append(next(new_rounds))
+
+    return rounds[R-1]
 
 
 def print_pairings(tournament, R):
     """Print the pairing list for a given round R and the complete tournament
     data as input. Results are expanded from a conversion dictionary defined as
-    a global variable. Return value is always None.
+    a global variable. The text is only formatted again if a result of round R
+    has changed since it was printed last. Return value is always None.
     """
-    pairing_list = tournament["rounds"][R-1]
+    text = get_rendered(tournament, R, "pairings")
+
+    if text is None:
+        lines = list()
+        for pairing in get_round(tournament, R):
+            white = tournament["player_list"][pairing[0]-1]["name"][:25]
+            black = tournament["player_list"][pairing[1]-1]["name"][:25]
+            result = EXPAND_RESULT[pairing[2]]
 
-    for pairing in pairing_list:
-        white = tournament["player_list"][pairing[0]-1]["name"][:25]
-        black = tournament["player_list"][pairing[1]-1]["name"][:25]
-        result = EXPAND_RESULT[pairing[2]]
+            lines.append(f"{white:25s} - {black:25s}  {result}\n")
 
-        print(f"{white:25s} - {black:25s}  {result}")
+        text = store_rendered(tournament, R, "pairings", "".join(lines))
 
-    print()
+    print(text)
 
     return None
 
 
+def set_result(tournament, R, game, result):
+    """Set the result of game number "game" in round R (both 1-based) without
+    printing or saving the tournament data. Returns the previous result of the
+    game, so that callers can update the scores incrementally.
+    """
+    pairing = get_round(tournament, R)[game-1]
+    old_result = pairing[2]
+    pairing[2] = result
+    if result != old_result:
+        invalidate_round(tournament, R)
+
+    return old_result
+
+
 def update_result(tournament, R, game, result):
     """Change the result of a game in a tournament. R designates the round,
     game the game number, but they need to be converted to 0-based indices! The
@@ -281,7 +616,7 @@ def update_result(tournament, R, game, result):
     confirmation from the user.
     """
     # Update the tournament results and standings
-    tournament["rounds"][R-1][game-1][2] = result
+    set_result(tournament, R, game, result)
 
     # Ask for confirmation and save the new tournament dictionary or discard.
     tmp_str = f"Aktualisierte Resultate in Runde {R}:"
@@ -289,7 +624,7 @@ def update_result(tournament, R, game, result):
     print("-" * len(tmp_str))
     print_pairings(tournament, R)
 
-    error = write_tournament_data(tournament)
+    error = update_game_data(tournament, R, game)
 
     if error == "OK":
         return tournament
@@ -346,18 +681,42 @@ def print_standings(tournament, R):
               " Turnier an.")
         return None
 
-    # Calculate scores after round R
-    tournament = refresh_scores(tournament, R)
+    # Scores and text are only calculated if a result in rounds 1...R has
+    # changed since the standings after round R were printed last.
+    text = get_rendered(tournament, R, "standings")
+
+    if text is None:
+        tournament = refresh_scores(tournament, R)
+        text = store_rendered(tournament, R, "standings",
+                format_ranking(tournament, f"Stand nach Runde {R}:"))
+
+    print(text, end="")
+
+    return None
+
+
+def print_ranking(tournament, title):
+    """Print the title, then the players sorted by the scores in the entry
+    "standings" of the tournament data (see format_ranking).
+    """
+    print(format_ranking(tournament, title), end="")
+
+    return None
 
+
+def format_ranking(tournament, title):
+    """Return the title and the players sorted by the scores in the entry
+    "standings" of the tournament data as text, including the DWZ rating and
+    the number of scored points. The scores are used as they are, so they
+    have to be calculated beforehand, e.g. by refresh_scores.
+    """
     # Create a sorted list of player indices (0-based) corresponding to the
     # sorted order of the scores in the tournament entry called "standings"
     scores = tournament["standings"]
     ranking = sorted(range(len(scores)), key = lambda k: scores[k], \
             reverse = True)
 
-    tmp_str = f"Stand nach Runde {R}:"
-    print("\n" + tmp_str)
-    print("=" * len(tmp_str))
+    lines = ["\n" + title + "\n", "=" * len(title) + "\n"]
 
     for rank, player_index in enumerate(ranking, 1):
         player_name = tournament['player_list'][player_index]['name']
@@ -367,11 +726,11 @@ def print_standings(tournament, R):
         if player_name == "spielfrei":
             continue
 
-        print(f"{rank:2d}. {player_name:25s}",
-              f"{(', ' + str(player_rating)) if player_rating else ' '*6}, ",
-              f"{player_score} Punkte")
+        lines.append(f"{rank:2d}. {player_name:25s} "
+              f"{(', ' + str(player_rating)) if player_rating else ' '*6},  "
+              f"{player_score} Punkte\n")
 
-    return None
+    return "".join(lines)
 
 
 def write_pairings_to_file(tournament, R):
@@ -21,11 +21,24 @@ for country, club, etc.).
 
 Functions in webscraper.py:
 ===========================
+DSBTableParser
+    HTML parser that reads the table of players from a page of the DSB rating
+    database and stops as soon as that table has been read completely.
+
+convert_table_row(row)
+    Converts a row of the DSB player table into a player dictionary.
+
 get_players_by_name(name)
     Accepts a string as input parameter, then calls the rating website of the 
     German Chess Association (Deutscher Schachbund, DSB) for that name and
     returns a list of dictionaries with the players that matched the name.
 
+get_search_url(name)
+    Returns the URL of the DSB search page for a name.
+
+read_player_table(response)
+    Reads the player table from the DSB search page in an HTTP response.
+
 print_player_list(player_list)
     Prints the list "player_list" in a structured form. Always returns None.
 
@@ -35,8 +48,10 @@ enter_player_data()
 
 chose_player()
     Lets the user enter a player name, then calls get_players_by_name to fetch
-    the results from the DSB database. Finally, lets the user chose one of the
-    hits or enter the data manually. Returns a dict with the player details.
+    the results from the DSB database. If there are no hits, similar names of
+    players from earlier tournaments are shown instead. Finally, lets the user
+    chose one of the hits or enter the data manually. Returns a dict with the
+    player details.
 
 create_player_list(number_players)
     Creates a list of players by calling chose_player "number_players" times.
@@ -48,49 +63,140 @@ main()
 """
 
 
-import pandas as pd
+import codecs
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+
+from playerindex import get_player_index, search_players, add_players
 
 
 # Global variable for German Chess Association's rating databases
 DB_DSB = "https://www.schachbund.de/spieler.html?search="
+# The players are listed in the second table of the DSB search page
+DSB_TABLE_INDEX = 1
+# Size of the blocks in which the search page is downloaded and parsed
+CHUNK_SIZE = 8192
+
+
+class DSBTableParser(HTMLParser):
+    """Reads the table with number DSB_TABLE_INDEX (0-based, in the order of
+    the opening tags) from an HTML page that is fed in blocks. The first row
+    contains the column names, every following row is converted into a player
+    dictionary by convert_table_row and appended to the list "players". All
+    other tables and all text outside of the table cells are ignored. "done"
+    is set when the table has ended, so the rest of the page does not have to
+    be downloaded.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs = True)
+        self.players = list()
+        self.done = False
+        self.tables = 0     # number of tables opened so far
+        self.depth = 0      # nesting depth of tables inside the player table
+        self.columns = None # column names from the first row
+        self.row = None     # texts of the cells of the current row
+        self.cell = None    # text fragments of the current cell
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.tables += 1
+            if self.depth or self.tables - 1 == DSB_TABLE_INDEX:
+                self.depth += 1
+        elif self.depth == 1 and tag == "tr":
+            self.row = list()
+        elif self.depth == 1 and tag in ("td", "th") and self.row is not None:
+            self.cell = list()
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        if tag in ("td", "th") and self.cell is not None:
+            self.row.append(" ".join("".join(self.cell).split()))
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            if self.columns is None:
+                self.columns = self.row
+            elif self.row:
+                self.players.append(
+                        convert_table_row(dict(zip(self.columns, self.row))))
+            self.row = None
+        elif tag == "table":
+            self.depth -= 1
+            self.done = not self.depth
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+def convert_table_row(row):
+    """Converts a row of the DSB player table, given as a dictionary of column
+    names and cell texts, into a player dictionary with entries for name, DWZ,
+    evals (number of DWZ evaluations), ELO and club. Empty ratings and players
+    with a provisional rating ("Restp.") get no rating entries.
+    """
+    player = dict()
+
+    try:
+        player["name"] = row["Spielername"]
+        tmp = row["DWZ"]
+        if tmp and tmp != "Restp.":
+            player["DWZ"] = int(tmp.split("-")[0])
+            player["evals"] = int(tmp.split("-")[1])
+        tmp = row["Elo"]
+        if tmp and tmp != "-----":
+            player["ELO"] = int(tmp)
+        player["club"] = row["Verein"]
+    except Exception as e:
+        print("\n\nERROR!\nWebseite kann nicht gelesen werden! Bitte",
+              f"kontaktieren Sie den Autor der Software!\n{e}\n\n")
+
+    return player
 
 
 def get_players_by_name(name):
     """Accepts a name (last, first) as input and retrieves corresponding player
-    details from the rating list of Deutscher Schachbund. Converts the scraped
-    HTML table into a list of dictionaries with entries for name (from
-    database), DWZ, evals (number of DWZ evaluations), ELO and club.
+    details from the rating list of Deutscher Schachbund. The page is
+    downloaded and parsed block by block, and the download is stopped as soon
+    as the player table has ended. Returns a list of dictionaries with entries
+    for name (from database), DWZ, evals (number of DWZ evaluations), ELO and
+    club.
     """
-    URL = DB_DSB + "%2C".join([s.strip() for s in name.split(",")])
-
-    results = list()
-
     try:
-        html = pd.read_html(URL)
+        with urllib.request.urlopen(get_search_url(name)) as response:
+            return read_player_table(response)
     except Exception as e:
         print(f"\n\nERROR beim Laden von Daten aus der DSB-Datenbank:\n{e}\n\n")
-        return results # results is an empty list at this point
+        return list()
 
-    for i in range(len(html[1])):
-        player = dict()
 
-        try:
-            player["name"] = html[1]["Spielername"][i]
-            tmp = html[1]["DWZ"][i]
-            if not pd.isna(tmp) and tmp != "Restp.":
-                player["DWZ"] = int(tmp.split("-")[0])
-                player["evals"] = int(tmp.split("-")[1])
-            tmp = html[1]["Elo"][i]
-            if tmp != "-----":
-                player["ELO"] = int(tmp)
-            player["club"] = html[1]["Verein"][i]
-        except Exception as e:
-            print("\n\nERROR!\nWebseite kann nicht gelesen werden! Bitte",
-                  f"kontaktieren Sie den Autor der Software!\n{e}\n\n")
+def get_search_url(name):
+    """Returns the URL of the DSB search page for a name (last, first). Every
+    part of the name is quoted separately, so that umlauts and blanks can be
+    sent, and the parts are joined by an encoded comma.
+    """
+    return DB_DSB + "%2C".join([urllib.parse.quote(s.strip())
+                                for s in name.split(",")])
 
-        results.append(player)
 
-    return results
+def read_player_table(response):
+    """Reads the DSB search page from an open HTTP response block by block
+    and returns the list of player dictionaries as soon as the player table
+    has ended. Errors are passed on to the calling function.
+    """
+    parser = DSBTableParser()
+    charset = response.headers.get_content_charset() or "utf-8"
+    decoder = codecs.getincrementaldecoder(charset)(errors = "replace")
+
+    while not parser.done:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(decoder.decode(chunk))
+
+    return parser.players
 
 
 def print_player_list(player_list):
@@ -184,6 +290,10 @@ def chose_player():
     them, or -- if the sought player is not in the list -- lets the user chose
     to enter the player details manually.
 
+    If the name is not found in the database, e.g. because of a typo or a
+    different spelling of umlauts, the most similar names of players from
+    earlier tournaments are listed instead.
+
     Returns a dict with the details for the chosen or manually entered player.
     """
     while True:
@@ -191,6 +301,11 @@ def chose_player():
         if name:
             break
     results = get_players_by_name(name)
+    if not results:
+        results = search_players(get_player_index(), name)
+        if results:
+            print("\nKeine Treffer in der DSB-Datenbank. Ähnliche Namen aus",
+                  "früheren Turnieren:\n")
     print_player_list(results)
     while True:
         print("\nBitte waehlen Sie einen Spieler aus der folgenden Liste.")
@@ -200,10 +315,15 @@ def chose_player():
         if choice.isnumeric():
             chosen = int(choice)
             if chosen == 0:
-                manual_entry = enter_player_data()
-                return manual_entry
+                player = enter_player_data()
+            elif chosen <= len(results):
+                player = results[chosen-1]
             else:
-                return results[chosen-1]
+                continue
+            # Make the player available for later searches in this session
+            if player:
+                add_players(get_player_index(), [player])
+            return player
 
 
 def create_player_list(number_players):